@@ -1,3 +1,4 @@
+import os
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -10,6 +11,36 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
     redis_url: str
+    occurrence_horizon_days: int = 365
+    rrule_cache_size: int = 1024
+    local_cache_size: int = 10000
+    local_cache_ttl_seconds: float = 10
+    cache_broker: str = "redis"  # "redis" or "memory" for a single process
+    negative_cache_ttl_seconds: int = 30
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 0  # 0 disables the timeout
+    database_replica_hostname: str = ""  # empty to serve reads from the primary
+    database_replica_port: str = ""  # defaults to database_port
+    replica_pin_seconds: float = 5
+    principal_cache_ttl_seconds: float = 30
+    principal_cache_redis: bool = False
+    token_cache_size: int = 10000
+    password_hash_workers: int = os.cpu_count() or 1
+    password_hash_max_queue: int = 100
+    revocation_sync_seconds: float = 60
+    revocation_bloom_capacity: int = 100000
+    revocation_bloom_error_rate: float = 0.001
+    acl_cache_ttl_seconds: float = 0  # 0 disables the cache
+    version_keyframe_interval: int = 20  # 1 stores every version as a full snapshot
+    immutable_cache_ttl_seconds: int = 86400
+    version_retention_count: int = 50  # newest versions of each event always kept in event_versions
+    version_retention_days: float = 90
+    compaction_interval_seconds: float = 0  # 0 disables the background job, use the CLI instead
+    json_renderer: str = "orjson"  # "orjson" or "json" for the standard library encoder
 
     class Config:
         env_file = ".env"
@@ -1,10 +1,16 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
+import time
+import uuid
 
 import schemas, database.connection as connection, models
 from auth.config import settings
+from auth.principal import get_principal
+from auth.revocation import is_token_revoked
+from services.local_cache import LocalCache
+from services import metrics
 
 from jose.exceptions import ExpiredSignatureError
 from jose import jwt
@@ -16,23 +22,37 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Payloads of tokens whose signature was already verified, keyed by the token itself
+token_cache = LocalCache(settings.token_cache_size, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
 
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire}) # Add expiration time to the token
+    to_encode.update({"jti": uuid.uuid4().hex}) # Unique token id, used to revoke it on logout
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str):
+    payload = token_cache.get(token)
+    if payload is not None and payload["exp"] > time.time():
+        metrics.inc("cache_requests_total", cache="token", result="hit")
+        return payload
+    metrics.inc("cache_requests_total", cache="token", result="miss")
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    token_cache.set(token, payload)
+    return payload
+
 def verify_access_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id = str(payload.get("user_id"))  # Convert user_id to string
         if user_id is None:
             raise credentials_exception
-        token_data = schemas.TokenData(id=user_id)
+        token_data = schemas.TokenData(id=user_id, jti=payload.get("jti"))
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                           detail="Token has expired", headers={"WWW-Authenticate": "Bearer"})
@@ -41,13 +61,21 @@ def verify_access_token(token: str, credentials_exception):
     return token_data
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(connection.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(connection.get_async_db)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                           detail=f"Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
 
     token_data = verify_access_token(token, credentials_exception)
 
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
+    # Tokens issued before revocation existed carry no jti and stay valid until they expire
+    if token_data.jti and await is_token_revoked(token_data.jti):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="Token has been revoked", headers={"WWW-Authenticate": "Bearer"})
+
+    # asyncpg does not coerce strings to integers
+    if not token_data.id.isdigit():
+        raise credentials_exception
+    user = await get_principal(db, int(token_data.id))
     if user is None:
         raise credentials_exception
     return user
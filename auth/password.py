@@ -1,10 +1,55 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from auth.config import settings
+from services import metrics
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so hashing on a thread pool keeps the event loop free and scales with cores
+_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_slots = asyncio.Semaphore(settings.password_hash_workers)
+_waiting = 0
+_running = 0
+
+
+async def run_password_work(fn, *args):
+    global _waiting, _running
+    if _waiting >= settings.password_hash_max_queue:
+        # Shed load instead of letting a login storm queue up behind the pool
+        metrics.inc("password_hash_rejected_total")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many login attempts, try again shortly")
+    started = time.perf_counter()
+    _waiting += 1
+    try:
+        await _slots.acquire()
+    finally:
+        _waiting -= 1
+    metrics.observe("password_hash_wait_seconds", time.perf_counter() - started)
+    _running += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _running -= 1
+        _slots.release()
+
+
 # Define a function to hash the password
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await run_password_work(pwd_context.hash, password)
+
+async def verify_password(plain_password:str, hashed_password:str) -> bool:
+    return await run_password_work(pwd_context.verify, plain_password, hashed_password)
+
+
+def password_pool_metrics():
+    return [
+        ("password_hash_queue_depth", {}, _waiting),
+        ("password_hash_in_flight", {}, _running),
+    ]
 
-def verify_password(plain_password:str, hashed_password:str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+metrics.register_collector(password_pool_metrics)
@@ -0,0 +1,101 @@
+import asyncio
+import json
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+import models
+from auth.config import settings
+from services.cache import cache_get, cache_set, local_get, local_set
+from services.local_cache import local_cache, publish_invalidation
+from services.redis_client import async_redis_client
+
+# Authenticated users are cached by id in the in-process tier and optionally in Redis.
+# The password hash is never cached, handlers only need the public columns.
+
+PRINCIPAL_TTL = settings.principal_cache_ttl_seconds
+PRINCIPAL_FIELDS = ("id", "username", "email", "created_at")
+
+
+def principal_tag(user_id):
+    return f"principal:{user_id}"
+
+def principal_key(user_id):
+    return f"principal:{user_id}"
+
+
+def dump_principal(values):
+    return json.dumps({**values, "created_at": values["created_at"].isoformat() if values["created_at"] else None})
+
+def load_principal(raw):
+    values = json.loads(raw)
+    if values["created_at"]:
+        values["created_at"] = datetime.fromisoformat(values["created_at"])
+    return values
+
+
+async def load_principal_values(db, user_id):
+    """Reads the principal from Redis when enabled, or from the database, which refills Redis."""
+    if settings.principal_cache_redis:
+        raw = await cache_get("principal", principal_key(user_id))
+        if raw:
+            return load_principal(raw)
+    user = await db.get(models.User, user_id)
+    if user is None:
+        return None
+    values = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    if settings.principal_cache_redis:
+        await cache_set("principal", principal_key(user_id), dump_principal(values), max(1, round(PRINCIPAL_TTL)))
+    return values
+
+
+async def get_principal(db, user_id):
+    """Returns the user with the given id, or None, reading the database only on a cache miss."""
+    local_key = ("principal", user_id)
+    values, epoch = local_get("principal", local_key)
+    if values is None:
+        values = await load_principal_values(db, user_id)
+        if values is None:
+            return None
+        # Only fills restart the TTL, so an entry changed outside the ORM hooks expires even while in use
+        local_set(local_key, values, (principal_tag(user_id),), epoch, PRINCIPAL_TTL)
+    # A fresh transient instance per request, never attached to a session
+    return models.User(**values)
+
+
+async def invalidate_principals(*user_ids):
+    if settings.principal_cache_redis:
+        await async_redis_client.delete(*(principal_key(user_id) for user_id in user_ids))
+    await publish_invalidation(*(principal_tag(user_id) for user_id in user_ids))
+
+
+# Users changed through the ORM are invalidated once the change is committed.
+# Bulk UPDATE/DELETE statements skip these hooks and rely on the TTL.
+_background_tasks = set()
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def remember_changed_user(mapper, connection, target):
+    object_session(target).info.setdefault("changed_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_changed_users(session):
+    user_ids = session.info.pop("changed_users", None)
+    if not user_ids:
+        return
+    local_cache.invalidate(*(principal_tag(user_id) for user_id in user_ids))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Synchronous scripts cannot reach the other workers, their copies expire with the TTL
+        return
+    task = loop.create_task(invalidate_principals(*user_ids))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_users(session):
+    session.info.pop("changed_users", None)
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import math
+import time
+from contextlib import suppress
+
+from auth.config import settings
+from services.local_cache import on_invalidation, publish_invalidation
+from services.redis_client import async_redis_client
+from services import metrics
+
+# Revoked token ids live in Redis until their token expires: one key per jti for lookups, and a
+# sorted set scored by expiry that workers load into an in-memory Bloom filter. Requests only go
+# to Redis when the filter reports a possible match.
+
+REVOKED_SET = "revoked_tokens"
+REVOKED_TAG_PREFIX = "revoked:"
+
+
+def revoked_key(jti):
+    return f"revoked:{jti}"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for a capacity and false positive rate."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        # Double hashing derives every position from two 64-bit halves
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def new_filter():
+    return BloomFilter(settings.revocation_bloom_capacity, settings.revocation_bloom_error_rate)
+
+
+revoked_filter = new_filter()
+# Until the first sync, and after invalidation messages may have been lost, every check goes to Redis
+filter_trusted = False
+_sync_task = None
+# Token ids revoked while a sync reads Redis, replayed into its rebuilt filter before the swap
+_added_during_sync = []
+
+
+def add_revoked(jti):
+    revoked_filter.add(jti)
+    for added in _added_during_sync:
+        added.add(jti)
+
+
+async def sync_revoked_filter():
+    global revoked_filter, filter_trusted
+    added = set()
+    _added_during_sync.append(added)
+    try:
+        now = time.time()
+        await async_redis_client.zremrangebyscore(REVOKED_SET, "-inf", now)
+        rebuilt = new_filter()
+        for jti in await async_redis_client.zrangebyscore(REVOKED_SET, now, "+inf"):
+            rebuilt.add(jti)
+        for jti in added:
+            rebuilt.add(jti)
+        revoked_filter = rebuilt
+        filter_trusted = True
+    finally:
+        _added_during_sync.remove(added)
+    metrics.set_gauge("revoked_tokens", await async_redis_client.zcard(REVOKED_SET))
+
+
+async def _sync_periodically():
+    while True:
+        await asyncio.sleep(settings.revocation_sync_seconds)
+        try:
+            await sync_revoked_filter()
+        except Exception as error:
+            print("Error syncing revoked tokens:", error)
+
+
+async def start_revocation_sync():
+    global _sync_task
+    await sync_revoked_filter()
+    _sync_task = asyncio.create_task(_sync_periodically())
+
+
+async def stop_revocation_sync():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _sync_task
+        _sync_task = None
+
+
+@on_invalidation
+def apply_revocations(tags):
+    global filter_trusted
+    if tags is None:
+        filter_trusted = False
+        return
+    for tag in tags:
+        if tag.startswith(REVOKED_TAG_PREFIX):
+            add_revoked(tag[len(REVOKED_TAG_PREFIX):])
+
+
+async def revoke_token(jti, expires_at):
+    ttl = math.ceil(expires_at - time.time())
+    if ttl <= 0:
+        return
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(revoked_key(jti), 1, ex=ttl)
+        pipe.zadd(REVOKED_SET, {jti: expires_at})
+        await pipe.execute()
+    add_revoked(jti)
+    await publish_invalidation(REVOKED_TAG_PREFIX + jti)
+
+
+async def is_token_revoked(jti):
+    if filter_trusted and jti not in revoked_filter:
+        metrics.inc("token_revocation_checks_total", result="filter_negative")
+        return False
+    revoked = await async_redis_client.exists(revoked_key(jti)) > 0
+    metrics.inc("token_revocation_checks_total", result="revoked" if revoked else "redis_negative")
+    return revoked
@@ -1,23 +1,78 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from auth.config import settings
+from database.instrumentation import InstrumentedQueuePool, InstrumentedAsyncQueuePool, instrument_engine
 
 # SQLAlchemy database URL
 DATABASE_URL = f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+# Pool settings shared by both engines
+POOL_OPTIONS = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
+# statement_timeout is passed as a server setting when connecting, psycopg2 and asyncpg take it differently
+def sync_connect_args():
+    if not settings.db_statement_timeout_ms:
+        return {}
+    return {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+
+def async_connect_args():
+    if not settings.db_statement_timeout_ms:
+        return {}
+    return {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+
+# Synchronous engine, used by scripts and for creating tables
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_logging_name="sync",
+    connect_args=sync_connect_args(),
+    **POOL_OPTIONS,
+)
+instrument_engine(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Engine used by the request handlers, its queries do not block the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_logging_name="primary",
+    connect_args=async_connect_args(),
+    **POOL_OPTIONS,
+)
+instrument_engine(async_engine.sync_engine, "primary")
+
+# Objects stay loaded after commit, an expired attribute cannot be lazy loaded from async code
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional streaming replica serving the read-only endpoints, see database.routing
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.database_replica_hostname:
+    REPLICA_DATABASE_URL = f"postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_replica_hostname}:{settings.database_replica_port or settings.database_port}/{settings.database_name}"
+    replica_engine = create_async_engine(
+        REPLICA_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_logging_name="replica",
+        connect_args=async_connect_args(),
+        **POOL_OPTIONS,
+    )
+    instrument_engine(replica_engine.sync_engine, "replica")
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, autoflush=False, expire_on_commit=False, info={"replica": True})
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # This code sets up a connection to a PostgreSQL database using SQLAlchemy.
\ No newline at end of file
@@ -0,0 +1,95 @@
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from services import metrics
+
+# Connection pool and query instrumentation, published through services.metrics
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class TimedCheckoutMixin:
+    """Records how long each pool checkout waited, including opening a new connection, and checkout timeouts."""
+
+    def _do_get(self):
+        engine = getattr(self, "logging_name", None) or "default"
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.inc("db_pool_timeouts_total", engine=engine)
+            raise
+        finally:
+            metrics.observe("db_pool_wait_seconds", time.perf_counter() - started, buckets=WAIT_BUCKETS, engine=engine)
+
+
+class InstrumentedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Statistics of the request being handled, set by track_queries
+_query_stats = ContextVar("query_stats", default=None)
+
+
+def track_queries():
+    """Start counting the queries of the current request, returns the QueryStats they are added to."""
+    stats = QueryStats()
+    _query_stats.set(stats)
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"]
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+
+_engines = {}
+
+
+def instrument_engine(engine, name):
+    """Publish pool gauges for the engine and add its queries to the per-request statistics."""
+    _engines[name] = engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def record_request_queries(stats, route):
+    metrics.observe("db_queries_per_request", stats.count, buckets=QUERY_COUNT_BUCKETS, route=route)
+    metrics.observe("db_time_per_request_seconds", stats.seconds, route=route)
+
+
+def pool_metrics():
+    samples = []
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        samples.append(("db_pool_size", {"engine": name}, pool.size()))
+        samples.append(("db_pool_checked_out", {"engine": name}, pool.checkedout()))
+        samples.append(("db_pool_checked_in", {"engine": name}, pool.checkedin()))
+        # Negative while the pool has not filled up to pool_size
+        samples.append(("db_pool_overflow", {"engine": name}, max(pool.overflow(), 0)))
+    return samples
+
+metrics.register_collector(pool_metrics)
@@ -0,0 +1,37 @@
+from fastapi import Depends, Request
+from jose import jwt
+from jose.exceptions import JWTError
+
+from auth.jwt import oauth2_scheme
+from database.connection import AsyncSessionLocal, ReplicaSessionLocal
+from services.cache import user_primary_key, event_primary_key
+from services.redis_client import async_redis_client
+from services import metrics
+
+
+# Dependency for read-only endpoints: a replica session, unless the caller or the event in the path
+# was written within the replica pin window, in which case the primary serves read-your-writes
+async def get_read_db(request: Request, token: str = Depends(oauth2_scheme)):
+    session_factory = AsyncSessionLocal
+    if ReplicaSessionLocal is not None and not await pinned_to_primary(request, token):
+        session_factory = ReplicaSessionLocal
+    metrics.inc("db_read_sessions_total", target="replica" if session_factory is ReplicaSessionLocal else "primary")
+    async with session_factory() as db:
+        yield db
+
+
+# Sessions for the database behind db, for work that outlives the request's session such as a streamed body
+def session_factory_for(db):
+    return ReplicaSessionLocal if db.info.get("replica") else AsyncSessionLocal
+
+
+async def pinned_to_primary(request, token):
+    # Only picks the database, get_current_user still verifies the token
+    try:
+        user_id = jwt.get_unverified_claims(token).get("user_id")
+    except JWTError:
+        return True
+    keys = [user_primary_key(user_id)]
+    if "id" in request.path_params:
+        keys.append(event_primary_key(request.path_params["id"]))
+    return await async_redis_client.exists(*keys) > 0
@@ -1,13 +1,13 @@
 # Standard library imports
-from fastapi import FastAPI, Request, Response, HTTPException
-import json
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 
 # Third-party imports
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.middleware import SlowAPIMiddleware
-import msgpack
 
 # Local imports
 from routers.auth import auth_router
@@ -15,12 +15,30 @@ from routers.event import event_router
 from routers.collaboration import collaboration_router
 from routers.version import version_router
 from routers.changelog import changelog_router
+from routers.metrics import metrics_router, metrics
 from database.connection import engine
 from database.connection import Base
+from database.instrumentation import track_queries, record_request_queries
 from schemas.response import APIResponse
+from services.local_cache import start_invalidation_listener, stop_invalidation_listener
+from auth.revocation import start_revocation_sync, stop_revocation_sync
+from services.compaction import start_compaction, stop_compaction
+from services.serialization import NegotiatedResponse, set_negotiated_media_type
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep this worker's in-process cache in sync with writes made by other workers
+    await start_invalidation_listener()
+    await start_revocation_sync()
+    await start_compaction()
+    yield
+    await stop_compaction()
+    await stop_revocation_sync()
+    await stop_invalidation_listener()
 
 # Create a FastAPI instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=NegotiatedResponse)
 
 # Create all tables (development only)
 Base.metadata.create_all(bind=engine)
@@ -31,27 +49,30 @@ app.state.limiter = limiter
 
 # Register the rate limit exceeded handler
 app.add_middleware(SlowAPIMiddleware)
+# Scrapers poll frequently and must not be rate limited
+limiter.exempt(metrics)
+
 
+# Middleware negotiating the response format, NegotiatedResponse encodes to it directly
+@app.middleware("http")
+async def content_negotiation_middleware(request: Request, call_next):
+    set_negotiated_media_type(request.headers.get("accept"))
+    return await call_next(request)
 
-# Middleware for Message Pack response
+# Middleware counting the queries of each request and the time spent in them
 @app.middleware("http")
-async def msgpack_middleware(request: Request, call_next):
+async def query_stats_middleware(request: Request, call_next):
+    stats = track_queries()
     response = await call_next(request)
-    accept = request.headers.get("accept", "")
-    if "application/msgpack" in accept:
-        # Get the JSON data from the response
-        body = b""
-        async for chunk in response.body_iterator:
-            body += chunk
-        # Decode JSON to dict, then encode as msgpack
-        dict_data = json.loads(body)
-        msgpack_bytes = msgpack.packb(dict_data, use_bin_type=True)
-        return Response(content=msgpack_bytes, media_type="application/msgpack")
+    route = request.scope.get("route")
+    record_request_queries(stats, route.path if route else "unmatched")
+    response.headers["Server-Timing"] = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
     return response
 
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return NegotiatedResponse(
         status_code=exc.status_code,
         content=APIResponse(
             success=False,
@@ -60,12 +81,18 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         ).model_dump()
     )
 
+# Validation errors keep FastAPI's default body, in the negotiated format
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    return NegotiatedResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
 # Include the routers
 app.include_router(auth_router)
 app.include_router(event_router)
 app.include_router(collaboration_router)
 app.include_router(version_router)
 app.include_router(changelog_router)
+app.include_router(metrics_router)
 
 # Root endpoint
 @app.get("/")
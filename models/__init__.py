@@ -2,4 +2,6 @@ from .user import User
 from .event import Event
 from .permission import EventPermission, RoleEnum
 from .version import EventVersion
-from .changelog import EventChangelog
\ No newline at end of file
+from .changelog import EventChangelog
+from .occurrence import EventOccurrence
+from .archive import EventVersionArchive
\ No newline at end of file
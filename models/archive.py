@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, LargeBinary, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from database.connection import Base
+
+class EventVersionArchive(Base):
+    __tablename__ = "event_version_archives"
+    id = Column(Integer, primary_key=True, index=True)
+    # Kept when the event is deleted, like its versions and changelog
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="SET NULL"))
+    first_version = Column(Integer, nullable=False)
+    last_version = Column(Integer, nullable=False)
+    version_count = Column(Integer, nullable=False)
+    changelog_count = Column(Integer, nullable=False)
+    # changed_at range of the archived changelog rows, so readers only decode the archives they need;
+    # NULL when there are none, and on archives written before the range was recorded
+    changelog_first_at = Column(DateTime(timezone=True))
+    changelog_last_at = Column(DateTime(timezone=True))
+    # zlib-compressed JSON of the full version snapshots and changelog rows moved out of the hot tables
+    data = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    event = relationship("Event", back_populates="archives")
+
+    __table_args__ = (
+        Index("ix_event_version_archives_event_range", "event_id", "first_version", "last_version"),
+    )
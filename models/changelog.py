@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.connection import Base
@@ -12,4 +12,9 @@ class EventChangelog(Base):
     changed_by = Column(Integer, ForeignKey("users.id"))
     changed_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    event = relationship("Event", back_populates="changelogs")
\ No newline at end of file
+    event = relationship("Event", back_populates="changelogs")
+
+    __table_args__ = (
+        # Keyset pagination and time range filters of an event's changelog
+        Index("ix_event_changelog_event_changed", "event_id", "changed_at", "id"),
+    )
\ No newline at end of file
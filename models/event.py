@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.connection import Base
@@ -16,8 +16,22 @@ class Event(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Time range covered by all occurrences of the event, span_end is NULL for open-ended recurrences
+    span_start = Column(DateTime(timezone=True))
+    span_end = Column(DateTime(timezone=True))
+    # Occurrences starting before this instant are materialized in event_occurrences
+    occurrences_until = Column(DateTime(timezone=True))
+    # Number of the latest version, NULL on rows written before the counter existed
+    current_version = Column(Integer)
 
     owner = relationship("User", back_populates="events")
     permissions = relationship("EventPermission", back_populates="event")
     versions = relationship("EventVersion", back_populates="event")
-    changelogs = relationship("EventChangelog", back_populates="event")
\ No newline at end of file
+    changelogs = relationship("EventChangelog", back_populates="event")
+    archives = relationship("EventVersionArchive", back_populates="event", passive_deletes=True)
+    occurrences = relationship("EventOccurrence", back_populates="event", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_events_owner_span", "owner_id", "span_start", "span_end"),
+        Index("ix_events_owner_start", "owner_id", "start_time", "id"),
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
+from database.connection import Base
+
+class EventOccurrence(Base):
+    __tablename__ = "event_occurrences"
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    occurrence_start = Column(DateTime(timezone=True), nullable=False)
+    occurrence_end = Column(DateTime(timezone=True), nullable=False)
+
+    event = relationship("Event", back_populates="occurrences")
+
+    __table_args__ = (
+        Index("ix_event_occurrences_event_range", "event_id", "occurrence_start", "occurrence_end"),
+    )
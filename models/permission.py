@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Enum, ForeignKey
+from sqlalchemy import Column, Integer, Enum, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database.connection import Base
 import enum
@@ -12,8 +12,13 @@ class EventPermission(Base):
     __tablename__ = "event_permissions"
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     role = Column(Enum(RoleEnum), nullable=False)
 
     event = relationship("Event", back_populates="permissions")
-    user = relationship("User", back_populates="permissions")
\ No newline at end of file
+    user = relationship("User", back_populates="permissions")
+
+    __table_args__ = (
+        # One role per user and event, also the conflict target of the sharing upsert
+        UniqueConstraint("event_id", "user_id", name="uq_event_permissions_event_user"),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, JSON
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, JSON, Boolean, Index, true
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.connection import Base
@@ -8,9 +8,15 @@ class EventVersion(Base):
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"))
     version = Column(Integer, nullable=False)
+    # The full event snapshot for keyframes, otherwise the fields changed since the previous version
     data = Column(JSON, nullable=False)
+    is_keyframe = Column(Boolean, nullable=False, default=True, server_default=true())
     changed_by = Column(Integer, ForeignKey("users.id"))
     changed_at = Column(DateTime(timezone=True), server_default=func.now())
     change_note = Column(String)
 
-    event = relationship("Event", back_populates="versions")
\ No newline at end of file
+    event = relationship("Event", back_populates="versions")
+
+    __table_args__ = (
+        Index("ix_event_versions_event_version", "event_id", "version", unique=True),
+    )
\ No newline at end of file
@@ -1,25 +1,47 @@
 from schemas.version import EventChangelogSchema, EventDiffResponse
-from schemas.response import APIResponse
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database.connection import get_db
+from schemas.response import APIResponse, PaginatedAPIResponse
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.routing import get_read_db
 from models import User
 from auth.jwt import get_current_user
-from typing import List
-from services.changelog_service import get_event_changelog_service, get_event_diff_service
+from typing import List, Optional
+from datetime import datetime
+from services.changelog_service import get_event_changelog_service, stream_event_changelog_service, get_event_diff_service
+from services.cache import etag_matches, immutable_headers
+from services.serialization import representation_etag
 
 changelog_router = APIRouter(prefix="/api/events", tags=["Changelog & Diff"])
 
 
-# Get chronological history of changes made to an event
-@changelog_router.get("/{id}/changelog", response_model=APIResponse[List[EventChangelogSchema]])
-async def get_event_changelog(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = get_event_changelog_service(id, db, current_user)
-    return APIResponse(success=True, message="Changelog fetched successfully", data=response)
+# Get chronological history of changes made to an event, one page at a time or streamed as NDJSON
+@changelog_router.get("/{id}/changelog", response_model=PaginatedAPIResponse[List[EventChangelogSchema]])
+async def get_event_changelog(
+    id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of entries to return, ignored when streaming"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
+    since: Optional[datetime] = Query(None, description="Only changes made at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only changes made before this time"),
+    changed_by: Optional[int] = Query(None, description="Only changes made by this user"),
+):
+    # Accept: application/x-ndjson streams every matching entry instead of a page
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        lines = await stream_event_changelog_service(id, db, current_user, cursor, since, until, changed_by)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    response, next_cursor = await get_event_changelog_service(id, db, current_user, limit, cursor, since, until, changed_by)
+    return PaginatedAPIResponse(success=True, message="Changelog fetched successfully", data=response, next_cursor=next_cursor)
 
 
 # Get the diff between two versions of an event
 @changelog_router.get("/{id}/diff/{version_id1}/{version_id2}", response_model=APIResponse[EventDiffResponse])
-async def get_event_diff(id: int, version_id1: int, version_id2: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = get_event_diff_service(id, version_id1, version_id2, db, current_user)
-    return APIResponse(success=True, message="Event diff fetched successfully", data=response)
\ No newline at end of file
+async def get_event_diff(id: int, version_id1: int, version_id2: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    diff, json_etag = await get_event_diff_service(id, version_id1, version_id2, db, current_user)
+    etag = representation_etag(json_etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=immutable_headers(etag))
+    response.headers.update(immutable_headers(etag))
+    return APIResponse(success=True, message="Event diff fetched successfully", data=diff)
\ No newline at end of file
@@ -1,24 +1,31 @@
 from fastapi import APIRouter, Depends, status
-from database.connection import get_db
-from sqlalchemy.orm import Session
+from database.connection import get_async_db
+from database.routing import get_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Event, User
 from schemas.response import APIResponse
-from schemas.permission import ShareEventRequest, PermissionResponse, UpdatePermissionRequest
+from schemas.permission import ShareEventRequest, UnshareEventRequest, PermissionResponse, UpdatePermissionRequest
 from auth.jwt import get_current_user
-from services.collaboration_service import share_event_service, get_event_permissions_service, update_user_permission_service, remove_user_permission_service
+from services.collaboration_service import share_event_service, unshare_event_service, get_event_permissions_service, update_user_permission_service, remove_user_permission_service
 
 collaboration_router = APIRouter(prefix="/api/events", tags=["Collaboration"])
 
 # Share an event with another user
 @collaboration_router.post("/{id}/share", response_model=APIResponse[list[PermissionResponse]])
-async def share_event(id: int, share_req: ShareEventRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = share_event_service(id, share_req, db, current_user)
+async def share_event(id: int, share_req: ShareEventRequest, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response = await share_event_service(id, share_req, db, current_user)
     return APIResponse(success=True, message="Event shared successfully", data=response)
 
+# Revoke the permissions of several users at once
+@collaboration_router.post("/{id}/unshare", response_model=APIResponse[list[PermissionResponse]])
+async def unshare_event(id: int, unshare_req: UnshareEventRequest, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response = await unshare_event_service(id, unshare_req, db, current_user)
+    return APIResponse(success=True, message="Event unshared successfully", data=response)
+
 # List all permissions for an event
 @collaboration_router.get("/{id}/permissions", response_model=APIResponse[list[PermissionResponse]])
-async def get_event_permissions(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = get_event_permissions_service(id, db, current_user)
+async def get_event_permissions(id: int, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    response = await get_event_permissions_service(id, db, current_user)
     return APIResponse(success=True, message="Event permissions fetched successfully", data=response)
     
 # Update an existing permission for a user for an event
@@ -27,10 +34,10 @@ async def update_user_permission(
     id: int,
     user_id: int, 
     update_req: UpdatePermissionRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    response = update_user_permission_service(id, user_id, update_req, db, current_user)
+    response = await update_user_permission_service(id, user_id, update_req, db, current_user)
     return APIResponse(success=True, message="Permission updated successfully", data=response)
 
 # Remove a user's permission for an event
@@ -38,7 +45,7 @@ async def update_user_permission(
 async def remove_user_permission(
     id: int,
     user_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return remove_user_permission_service(id, user_id, db, current_user)
\ No newline at end of file
+    return await remove_user_permission_service(id, user_id, db, current_user)
\ No newline at end of file
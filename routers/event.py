@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, status, Query
-from sqlalchemy.orm import Session
-from database.connection import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import get_async_db
+from database.routing import get_read_db
 from models import User
-from schemas.response import APIResponse
+from schemas.response import APIResponse, PaginatedAPIResponse
 from schemas.event import EventCreate, EventResponse, EventUpdate, EventBatchCreate
 from auth.jwt import get_current_user
 from datetime import datetime
@@ -21,49 +22,50 @@ event_router = APIRouter(prefix="/api/events", tags=["Event Management"])
     
 # Create a new event
 @event_router.post("/", response_model=APIResponse[EventResponse], status_code=status.HTTP_201_CREATED)
-async def create_event(event: EventCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = create_event_service(event, db, current_user)
+async def create_event(event: EventCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response = await create_event_service(event, db, current_user)
     return APIResponse(success=True, message="Event created successfully", data=response)
 
 
 # Create multiple events in a batch
 @event_router.post("/batch", response_model=APIResponse[list[EventResponse]], status_code=status.HTTP_201_CREATED)
-async def create_events_batch(batch: EventBatchCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = batch_create_events_service(batch, db, current_user)
+async def create_events_batch(batch: EventBatchCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response = await batch_create_events_service(batch, db, current_user)
     return APIResponse(success=True, message="Events created successfully", data=response)
 
 
 # Get an event by ID
 @event_router.get("/{id}", response_model=APIResponse[EventResponse])
-async def get_event(id:int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    repsonse = get_event_service(id, db, current_user)
+async def get_event(id:int, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    repsonse = await get_event_service(id, db, current_user)
     return APIResponse(success=True, message="Event fetched successfully", data=repsonse)
 
 
 # Get all events for the current user
-@event_router.get("/", response_model = APIResponse[list[EventResponse]])
+@event_router.get("/", response_model = PaginatedAPIResponse[list[EventResponse]])
 async def list_events(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0, description="Number of events to skip"),
     limit: int = Query(10, ge=1, le=100, description="Maximum number of events to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page, replaces skip"),
     is_recurring: Optional[bool] = Query(None, description="Filter by recurring events"),
     search: Optional[str] = Query(None, description="Search by title or description"),
     start_date: Optional[datetime] = Query(None, description="Filter events starting after this date"),
     end_date: Optional[datetime] = Query(None, description="Filter events ending before this date"),
 ):
-    response =  list_events_service(db, current_user, skip, limit, is_recurring, search, start_date, end_date)
-    return APIResponse(success=True,message="Events fetched successfully",data=response)
+    response, next_cursor = await list_events_service(db, current_user, skip, limit, is_recurring, search, start_date, end_date, cursor)
+    return PaginatedAPIResponse(success=True,message="Events fetched successfully",data=response,next_cursor=next_cursor)
 
 
 # Update an event
 @event_router.put("/{id}", response_model=APIResponse[EventResponse])
-async def update_event(id: int, event_update: EventUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = update_event_service(id, event_update, db, current_user)
+async def update_event(id: int, event_update: EventUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response = await update_event_service(id, event_update, db, current_user)
     return APIResponse(success=True, message="Event updated successfully", data=response)
 
 
 # Delete an event
 @event_router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_event(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return delete_event_service(id, db, current_user)
\ No newline at end of file
+async def delete_event(id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    return await delete_event_service(id, db, current_user)
\ No newline at end of file
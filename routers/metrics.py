@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import render_prometheus
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+# Prometheus scrape endpoint for the in-process metrics of this worker
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_prometheus()
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database.connection import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import get_async_db
+from database.routing import get_read_db
 from models import User
 from schemas.response import APIResponse
 from auth.jwt import get_current_user
 from schemas.version import EventVersionSchema
 from services.version_service import get_event_version_service, rollback_event_service
+from services.cache import etag_matches, immutable_headers
+from services.serialization import representation_etag
 
 # Retrieve the version history of an event
 version_router = APIRouter(prefix="/api/events", tags=["Version History"])
 @version_router.get("/{id}/history/{version_id}", response_model=APIResponse[EventVersionSchema])
-async def get_event_version(id: int, version_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response =  get_event_version_service(id, version_id, db, current_user)
-    return APIResponse(success=True, message="Event version fetched successfully", data=response)
+async def get_event_version(id: int, version_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    version, json_etag = await get_event_version_service(id, version_id, db, current_user)
+    etag = representation_etag(json_etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=immutable_headers(etag))
+    response.headers.update(immutable_headers(etag))
+    return APIResponse(success=True, message="Event version fetched successfully", data=version)
 
 
 # Rollback to a specific version of an event
 @version_router.post("/{id}/rollback/{version_id}", response_model=APIResponse[EventVersionSchema])
-async def rollback_event(id: int, version_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    response = rollback_event_service(id, version_id, db, current_user)
+async def rollback_event(id: int, version_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response = await rollback_event_service(id, version_id, db, current_user)
     return APIResponse(success=True, message="Event rolled back successfully", data=response)
\ No newline at end of file
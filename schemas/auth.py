@@ -20,6 +20,7 @@ class UserResponse(BaseModel):
 
 class TokenData(BaseModel):
     id: Optional[str] = None
+    jti: Optional[str] = None
 
 class UserWithToken(BaseModel):
     user: UserResponse
@@ -9,6 +9,9 @@ class Shareuser(BaseModel):
 class ShareEventRequest(BaseModel):
     users: List[Shareuser]
 
+class UnshareEventRequest(BaseModel):
+    user_ids: List[int]
+
 class PermissionResponse(BaseModel):
     user_id: int
     role: RoleEnum
@@ -7,4 +7,8 @@ T = TypeVar('T')
 class APIResponse(BaseModel, Generic[T]):
     success: bool
     message: str
-    data: Optional[Any] = None
\ No newline at end of file
+    data: Optional[Any] = None
+
+class PaginatedAPIResponse(APIResponse[T], Generic[T]):
+    # Opaque cursor for the next page, None on the last page
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,63 @@
+from sqlalchemy import select, and_
+
+from auth.config import settings
+from models import Event, EventPermission, RoleEnum
+from services.cache import local_get, local_set, event_tag
+
+# Authorization of a user on an event, shared by the event, version, changelog and collaboration services.
+# Results are memoized in the session info, which lives for one request.
+
+ACL_CACHE_TTL = settings.acl_cache_ttl_seconds
+
+
+def effective_role(owner_id, role, user_id):
+    return RoleEnum.owner if owner_id == user_id else role
+
+
+async def resolve_access(db, event_id, user_id):
+    """
+    Returns (event, role) for the user in a single query. event is None when it does not exist,
+    role is RoleEnum.owner for the owner, the shared role, or None without access.
+    """
+    memo = db.info.setdefault("access", {})
+    if (event_id, user_id) in memo:
+        return memo[(event_id, user_id)]
+    row = (await db.execute(
+        select(Event, EventPermission.role)
+        .outerjoin(EventPermission, and_(EventPermission.event_id == Event.id, EventPermission.user_id == user_id))
+        .where(Event.id == event_id)
+        .limit(1)
+    )).first()
+    access = (row[0], effective_role(row[0].owner_id, row[1], user_id)) if row else (None, None)
+    memo[(event_id, user_id)] = access
+    return access
+
+
+async def load_acl(db, event_id):
+    rows = (await db.execute(
+        select(Event.owner_id, EventPermission.user_id, EventPermission.role)
+        .outerjoin(EventPermission, EventPermission.event_id == Event.id)
+        .where(Event.id == event_id)
+    )).all()
+    if not rows:
+        return None
+    return {"owner_id": rows[0].owner_id, "roles": {row.user_id: row.role for row in rows if row.user_id is not None}}
+
+
+async def resolve_role(db, event_id, user_id):
+    """
+    Returns the user's role on the event, or None when the event does not exist or is not visible to them.
+    For checks that do not need the event row: with ACL_CACHE_TTL_SECONDS set, the event's access list is
+    cached per worker and dropped by invalidate_event, which every permission change calls.
+    """
+    if not ACL_CACHE_TTL:
+        return (await resolve_access(db, event_id, user_id))[1]
+    memo = db.info.setdefault("access", {})
+    if (event_id, user_id) in memo:
+        return memo[(event_id, user_id)][1]
+    local_key = ("acl", event_id)
+    acl, epoch = local_get("acl", local_key)
+    if acl is None:
+        acl = await load_acl(db, event_id) or {"owner_id": None, "roles": {}}
+        local_set(local_key, acl, (event_tag(event_id),), epoch, ACL_CACHE_TTL)
+    return effective_role(acl["owner_id"], acl["roles"].get(user_id), user_id)
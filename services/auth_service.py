@@ -1,19 +1,21 @@
 from fastapi import HTTPException, status
+from sqlalchemy import select
 from models import User
 from schemas import UserResponse
-from auth.jwt import create_access_token
+from auth.jwt import create_access_token, decode_access_token
+from auth.revocation import revoke_token
 from auth.password import hash_password, verify_password
 from datetime import datetime, timezone
 
 # Service to handle user authentication and registration
-def register_service(user, db):
-    if db.query(User).filter((User.username == user.username) | (User.email == user.email)).first():
+async def register_service(user, db):
+    if await db.scalar(select(User).where((User.username == user.username) | (User.email == user.email))):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(username=user.username, email=user.email, password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     access_token = create_access_token(data={"user_id": db_user.id})
     user_response = UserResponse.model_validate(db_user)
@@ -25,9 +27,9 @@ def register_service(user, db):
         }
 
 # Service to handle user login
-def login_service(request, db):
-    user = db.query(User).filter((User.email == request.username) | (User.username == request.username)).first()
-    if not user or not verify_password(request.password, user.password):
+async def login_service(request, db):
+    user = await db.scalar(select(User).where((User.email == request.username) | (User.username == request.username)))
+    if not user or not await verify_password(request.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
     access_token = create_access_token(data={"user_id": user.id})
@@ -40,7 +42,7 @@ def login_service(request, db):
         }
 
 # Service to handle token refresh
-def refresh_token_service(current_user, db):
+async def refresh_token_service(current_user, db):
     access_token = create_access_token(data={"user_id": current_user.id})
     user_response = UserResponse.model_validate(current_user)
     return {
@@ -50,9 +52,11 @@ def refresh_token_service(current_user, db):
     }
 
 # Service to logout a user
-def logout_service(current_user, db):
+async def logout_service(token, current_user, db):
     """
-    We've used stateless JWT tokens for authentication, so we don't have a server-side session to invalidate.
-    The logout is supposed to be handled by the client by removing the token from local storage or cookies.
+    Revokes the bearer token used for the request until it expires.
+    Other tokens of the user stay valid, the client should also discard this one.
     """
-    pass
\ No newline at end of file
+    payload = decode_access_token(token)
+    if payload.get("jti"):
+        await revoke_token(payload["jti"], payload["exp"])
\ No newline at end of file
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from contextlib import suppress
+
+from fastapi import HTTPException
+from redis.exceptions import LockError
+from sqlalchemy import select
+
+from auth.config import settings
+from database.connection import replica_engine
+from models import EventPermission
+from services.redis_client import async_redis_client
+from services.local_cache import local_cache, publish_invalidation
+from services import metrics
+
+# Cache keys embed generation counters: invalidating is a single INCR and the
+# entries of older generations are never read again and expire through their TTL.
+# Every read renews a counter's expiry, so it only expires after going unused for longer
+# than any entry keyed by it can live.
+
+def user_generation_key(user_id):
+    return f"events:user:{user_id}:gen"
+
+def event_generation_key(event_id):
+    return f"event:{event_id}:gen"
+
+
+# While present, reads for the user or event go to the primary instead of a lagging replica
+def user_primary_key(user_id):
+    return f"primary:user:{user_id}"
+
+def event_primary_key(event_id):
+    return f"primary:event:{event_id}"
+
+REPLICA_PIN_MS = int(settings.replica_pin_seconds * 1000)
+
+
+async def get_generation(key):
+    generation = await async_redis_client.getex(key, ex=GENERATION_TTL)
+    if generation is None:
+        # Seed with a timestamp so a counter lost to eviction or expiry never reuses an old generation
+        await async_redis_client.set(key, time.time_ns(), nx=True, ex=GENERATION_TTL)
+        generation = await async_redis_client.get(key)
+    return generation
+
+
+async def bump_generations(keys, primary_keys=()):
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.set(key, time.time_ns(), nx=True, ex=GENERATION_TTL)
+            pipe.incr(key)
+            pipe.expire(key, GENERATION_TTL)
+        # A replica read could otherwise refill the new generation with the data just replaced
+        if replica_engine is not None:
+            for key in primary_keys:
+                pipe.set(key, 1, px=REPLICA_PIN_MS)
+        await pipe.execute()
+
+
+EVENT_CACHE_TTL = 300  # 5 minutes
+LIST_CACHE_TTL = 300
+NEGATIVE_CACHE_TTL = settings.negative_cache_ttl_seconds
+# Not-found and forbidden lookups are cached briefly so repeated probes skip the database
+NEGATIVE_STATUSES = {403, 404}
+# Spread expiry of entries written together by +/- 10%
+TTL_JITTER = 0.1
+# Higher values refresh earlier (XFetch beta)
+EARLY_REFRESH_BETA = 1.0
+LOCK_TIMEOUT = 10
+# Longest life of an entry keyed by a generation, counted from the read of the generation: the
+# load holding the lock, then the jittered entry TTL
+GENERATION_TTL = LOCK_TIMEOUT + math.ceil(max(EVENT_CACHE_TTL, LIST_CACHE_TTL, NEGATIVE_CACHE_TTL) * (1 + TTL_JITTER))
+SINGLE_FLIGHT_WAIT = 0.5
+SINGLE_FLIGHT_POLL = 0.02
+
+# Immutable entries are never invalidated, the TTL only bounds memory
+IMMUTABLE_CACHE_TTL = settings.immutable_cache_ttl_seconds
+
+# Entry sizes, to size Redis memory from the number of cached keys
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+async def cache_get(cache, key):
+    value = await async_redis_client.get(key)
+    metrics.inc("cache_requests_total", cache=cache, result="miss" if value is None else "hit")
+    return value
+
+
+async def cache_set(cache, key, value, ttl):
+    await async_redis_client.setex(key, ttl, value)
+    metrics.observe("cache_entry_bytes", len(value), buckets=BYTE_BUCKETS, cache=cache)
+
+
+def jittered(ttl):
+    return max(1, round(ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)))
+
+
+# Decide to recompute ahead of expiry with a probability that grows as expiry nears and with the cost of the value
+def should_refresh_early(envelope):
+    expires = envelope.get("expires")
+    if expires is None:
+        return False
+    return time.time() - envelope.get("delta", 0) * EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= expires
+
+
+def unwrap(cache, envelope, parse):
+    if "error" in envelope:
+        metrics.inc("cache_negative_hits_total", cache=cache)
+        status_code, detail = envelope["error"]
+        raise HTTPException(status_code=status_code, detail=detail)
+    # Entries written before envelopes were introduced hold the value itself
+    return parse(envelope["value"] if "value" in envelope else envelope)
+
+
+async def read_through(cache, key, load, dump, parse, ttl):
+    """
+    Returns the cached value for key, or computes it with await load() and caches it.
+    Concurrent misses for a key are coalesced behind a Redis lock so only one of them
+    runs load(); a value is refreshed early by a single caller before it expires; and
+    403/404 results are cached for NEGATIVE_CACHE_TTL and re-raised.
+    """
+    raw = await cache_get(cache, key)
+    envelope = json.loads(raw) if raw else None
+    if envelope is not None:
+        if not should_refresh_early(envelope):
+            return unwrap(cache, envelope, parse)
+        metrics.inc("cache_early_refreshes_total", cache=cache)
+
+    lock = async_redis_client.lock(f"lock:{key}", timeout=LOCK_TIMEOUT, blocking=False)
+    if not await lock.acquire():
+        # Another request is computing the value: keep serving the current one, or wait for it
+        if envelope is not None:
+            return unwrap(cache, envelope, parse)
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(SINGLE_FLIGHT_POLL)
+            raw = await async_redis_client.get(key)
+            if raw:
+                metrics.inc("cache_coalesced_total", cache=cache)
+                return unwrap(cache, json.loads(raw), parse)
+        metrics.inc("cache_single_flight_timeouts_total", cache=cache)
+        lock = None
+
+    try:
+        started = time.monotonic()
+        try:
+            value = await load()
+        except HTTPException as error:
+            if error.status_code in NEGATIVE_STATUSES:
+                metrics.inc("cache_negative_stores_total", cache=cache, status=error.status_code)
+                await cache_set(cache, key, json.dumps({"error": [error.status_code, error.detail]}), jittered(NEGATIVE_CACHE_TTL))
+            raise
+        ttl = jittered(ttl)
+        envelope = {"value": dump(value), "delta": time.monotonic() - started, "expires": time.time() + ttl}
+        await cache_set(cache, key, json.dumps(envelope), ttl)
+        return value
+    finally:
+        if lock is not None:
+            with suppress(LockError):
+                await lock.release()
+
+
+# In-process tier holding ready-to-serve objects, checked before Redis.
+# Returns (value, epoch); pass the epoch back to local_set so a value is only stored
+# if none of its tags was invalidated while it was being computed.
+def local_get(cache, key):
+    epoch = local_cache.epoch
+    value = local_cache.get(key)
+    metrics.inc("cache_requests_total", cache=f"{cache}_local", result="miss" if value is None else "hit")
+    return value, epoch
+
+
+def local_set(key, value, tags, epoch, ttl=None):
+    local_cache.set(key, value, tags, epoch, ttl)
+
+
+# Results derived only from immutable rows, such as a stored event version, are cached in both
+# tiers under a key naming that content, without generations or tags. Returns (payload, etag),
+# the strong ETag being a hash of the payload and naming its JSON representation; routes derive
+# the ETag of other formats with serialization.representation_etag. load() must return a
+# JSON-compatible value.
+async def read_immutable(cache, key, load):
+    local_key = ("immutable", key)
+    entry, epoch = local_get(cache, local_key)
+    if entry is None:
+        raw = await cache_get(cache, key)
+        if raw:
+            entry = json.loads(raw)
+        else:
+            payload = await load()
+            digest = hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+            entry = {"etag": f'"{digest[:32]}"', "payload": payload}
+            await cache_set(cache, key, json.dumps(entry), IMMUTABLE_CACHE_TTL)
+        local_set(local_key, entry, (), epoch, IMMUTABLE_CACHE_TTL)
+    return entry["payload"], entry["etag"]
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+# Clients revalidate on every use, so the permission check still runs before a 304
+def immutable_headers(etag):
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept, Authorization"}
+
+
+# Invalidation tags of local entries
+def event_tag(event_id):
+    return f"event:{event_id}"
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+# Cache key for a single event as seen by a user
+async def event_cache_key(event_id, user_id):
+    generation = await get_generation(event_generation_key(event_id))
+    return f"event:{event_id}:gen:{generation}:user:{user_id}"
+
+
+# Cache key for a page of the user's event list
+async def list_cache_key(user_id, **params):
+    generation = await get_generation(user_generation_key(user_id))
+    return f"events:user:{user_id}:gen:{generation}:" + ":".join(f"{k}:{v}" for k, v in params.items())
+
+
+# Drop every cached list of the given users
+async def invalidate_user_lists(*user_ids):
+    await bump_generations(
+        [user_generation_key(user_id) for user_id in user_ids],
+        [user_primary_key(user_id) for user_id in user_ids],
+    )
+    await publish_invalidation(*(user_tag(user_id) for user_id in user_ids))
+
+
+# Drop the cached copies (and cached 403/404 results) of events for all users
+async def invalidate_event(*event_ids):
+    if not event_ids:
+        return
+    await bump_generations(
+        [event_generation_key(event_id) for event_id in event_ids],
+        [event_primary_key(event_id) for event_id in event_ids],
+    )
+    await publish_invalidation(*(event_tag(event_id) for event_id in event_ids))
+
+
+# Users who can see an event: its owner and everyone it is shared with
+async def event_audience(db, event_id, owner_id):
+    shared_with = await db.scalars(select(EventPermission.user_id).where(EventPermission.event_id == event_id))
+    return {owner_id, *shared_with}
+
+
+def local_cache_metrics():
+    return [("local_cache_entries", {}, len(local_cache))]
+
+metrics.register_collector(local_cache_metrics)
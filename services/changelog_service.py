@@ -1,28 +1,185 @@
+import base64
+import heapq
+import json
+from contextlib import aclosing
+from datetime import datetime
+
 from fastapi import HTTPException, status
-from models import Event, EventChangelog, EventVersion, EventPermission
-from deepdiff import DeepDiff
-from services.event_service import make_json_serializable
+from sqlalchemy import select, or_, tuple_
+from models import EventChangelog, EventVersionArchive
+from services.access import resolve_role
+from services.version_store import load_version, unpack_archive
+from services.event_service import ensure_utc
+from services.diff import DIFF_FORMAT, diff_snapshots, normalize_diff
+from services.cache import read_immutable
+from database.routing import session_factory_for
 from schemas.version import EventChangelogResponse
 
-# Service to retrieve the chronological history of changes made to an event
-def get_event_changelog_service(id, db, current_user):
-    event = db.query(Event).filter(Event.id == id).first()
-    if not event or (event.owner_id != current_user.id and not db.query(EventPermission).filter_by(event_id = id, user_id = current_user.id).first()):
+# Rows fetched per round trip while streaming a changelog
+CHANGELOG_STREAM_BATCH = 500
+
+
+# Opaque keyset cursor over the (changed_at, id) ordering of a changelog
+def encode_changelog_cursor(entry):
+    payload = json.dumps({"changed_at": entry.changed_at.isoformat(), "id": entry.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_changelog_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["changed_at"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+# Changelog entries of an event in chronological order, filtered in SQL on the (event_id, changed_at, id) index
+def changelog_query(id, cursor, since, until, changed_by):
+    query = select(EventChangelog).where(EventChangelog.event_id == id, EventChangelog.version_id.is_not(None))
+    if cursor:
+        query = query.where(tuple_(EventChangelog.changed_at, EventChangelog.id) > tuple_(*decode_changelog_cursor(cursor)))
+    if since:
+        query = query.where(EventChangelog.changed_at >= since)
+    if until:
+        query = query.where(EventChangelog.changed_at < until)
+    if changed_by is not None:
+        query = query.where(EventChangelog.changed_by == changed_by)
+    return query.order_by(EventChangelog.changed_at, EventChangelog.id)
+
+
+def changelog_key(entry):
+    return entry.changed_at, entry.id
+
+
+# Entries moved into archives by services.compaction stay part of the changelog. They are read back
+# from the archives whose changed_at range overlaps the request, and filtered like changelog_query.
+async def archived_changelog_groups(db, id, cursor, since, until):
+    """
+    Returns the ids of the event's archives that may hold matching entries, in groups whose
+    changed_at ranges do not overlap, oldest first. An archive without a recorded range is
+    grouped with every archive after it.
+    """
+    window = [EventVersionArchive.event_id == id, EventVersionArchive.changelog_count > 0]
+    lower_bounds = [ensure_utc(since)] if since else []
+    if cursor:
+        lower_bounds.append(decode_changelog_cursor(cursor)[0])
+    if lower_bounds:
+        window.append(or_(EventVersionArchive.changelog_last_at.is_(None), EventVersionArchive.changelog_last_at >= max(lower_bounds)))
+    if until:
+        window.append(or_(EventVersionArchive.changelog_first_at.is_(None), EventVersionArchive.changelog_first_at < ensure_utc(until)))
+    archives = (await db.execute(
+        select(EventVersionArchive.id, EventVersionArchive.changelog_first_at, EventVersionArchive.changelog_last_at)
+        .where(*window)
+        .order_by(EventVersionArchive.changelog_first_at.nulls_first(), EventVersionArchive.id)
+    )).all()
+    groups, group_end = [], None
+    for archive_id, first_at, last_at in archives:
+        if groups and (group_end is None or first_at is None or first_at <= group_end):
+            groups[-1].append(archive_id)
+            group_end = None if group_end is None or last_at is None else max(group_end, last_at)
+        else:
+            groups.append([archive_id])
+            group_end = last_at
+    return groups
+
+
+def archived_entries(id, blob, cursor, since, until, changed_by):
+    """The matching changelog entries of one archive as detached EventChangelog rows."""
+    after = decode_changelog_cursor(cursor) if cursor else None
+    since = ensure_utc(since) if since else None
+    until = ensure_utc(until) if until else None
+    for entry in unpack_archive(blob)["changelog"]:
+        if entry["version_id"] is None or not entry["changed_at"]:
+            continue
+        row = EventChangelog(**{**entry, "changed_at": datetime.fromisoformat(entry["changed_at"])}, event_id=id)
+        if after and changelog_key(row) <= after:
+            continue
+        if (since and row.changed_at < since) or (until and row.changed_at >= until):
+            continue
+        if changed_by is not None and row.changed_by != changed_by:
+            continue
+        yield row
+
+
+async def archived_changelog(db, groups, id, cursor, since, until, changed_by):
+    """Yields the matching archived entries in cursor order, decoding one group of archives at a time."""
+    for group in groups:
+        entries = []
+        for archive_id in group:
+            blob = await db.scalar(select(EventVersionArchive.data).where(EventVersionArchive.id == archive_id))
+            # Restored since the groups were read, its entries are back in event_changelog
+            if blob is not None:
+                entries.extend(archived_entries(id, blob, cursor, since, until, changed_by))
+        entries.sort(key=changelog_key)
+        for entry in entries:
+            yield entry
+
+
+# Rows written before the current diff format are converted on read
+def changelog_response(entry):
+    return EventChangelogResponse.model_validate({
+        **{field: getattr(entry, field) for field in EventChangelogResponse.model_fields},
+        "diff": normalize_diff(entry.diff),
+    })
+
+
+# Service to retrieve one page of the chronological history of changes made to an event
+async def get_event_changelog_service(id, db, current_user, limit, cursor=None, since=None, until=None, changed_by=None):
+    if await resolve_role(db, id, current_user.id) is None:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    hot = (await db.scalars(changelog_query(id, cursor, since, until, changed_by).limit(limit))).all()
+    # Only the first `limit` archived entries can be on the page
+    archived = []
+    groups = await archived_changelog_groups(db, id, cursor, since, until)
+    async with aclosing(archived_changelog(db, groups, id, cursor, since, until, changed_by)) as entries:
+        async for entry in entries:
+            archived.append(entry)
+            if len(archived) == limit:
+                break
+    changelog = list(heapq.merge(archived, hot, key=changelog_key))[:limit]
+    next_cursor = encode_changelog_cursor(changelog[-1]) if len(changelog) == limit else None
+    return [changelog_response(entry) for entry in changelog], next_cursor
+
+
+# Service to stream the whole matching history as NDJSON, one entry per line, holding one batch of rows at a time
+async def stream_event_changelog_service(id, db, current_user, cursor=None, since=None, until=None, changed_by=None):
+    # Checked before the response starts so errors keep their status code
+    if await resolve_role(db, id, current_user.id) is None:
         raise HTTPException(status_code=403, detail="Permission denied")
-    changelog = db.query(EventChangelog).filter_by(event_id=id).order_by(EventChangelog.changed_at.asc()).all()
-    valid_changelog = [entry for entry in changelog if entry.version_id is not None]
+    groups = await archived_changelog_groups(db, id, cursor, since, until)
+    query = changelog_query(id, cursor, since, until, changed_by).execution_options(yield_per=CHANGELOG_STREAM_BATCH)
+    # The request's session is closed before the body is sent, the rows are read from a session of their own
+    session_factory = session_factory_for(db)
+
+    async def lines():
+        async with session_factory() as session:
+            # Archived entries are merged in as the hot rows stream past them
+            async with aclosing(archived_changelog(session, groups, id, cursor, since, until, changed_by)) as archived:
+                pending = await anext(archived, None)
+                async for entry in await session.stream_scalars(query):
+                    while pending is not None and changelog_key(pending) < changelog_key(entry):
+                        yield changelog_response(pending).model_dump_json() + "\n"
+                        pending = await anext(archived, None)
+                    yield changelog_response(entry).model_dump_json() + "\n"
+                while pending is not None:
+                    yield changelog_response(pending).model_dump_json() + "\n"
+                    pending = await anext(archived, None)
 
-    return [EventChangelogResponse.model_validate(entry) for entry in valid_changelog]
+    return lines()
 
-# Service to get the diff between two versions of an event
-def get_event_diff_service(id, version_id1, version_id2, db, current_user):
-    event = db.query(Event).filter(Event.id == id).first()
-    if not event or (event.owner_id !=  current_user.id and not db.query(EventPermission).filter_by(event_id = id, user_id = current_user.id).first()):
+# Returns the diff and its ETag
+async def get_event_diff_service(id, version_id1, version_id2, db, current_user):
+    if await resolve_role(db, id, current_user.id) is None:
         raise HTTPException(status_code=403, detail="Permission denied")
-    version1 = db.query(EventVersion).filter_by(event_id=id, version=version_id1).first()
-    version2 = db.query(EventVersion).filter_by(event_id=id, version=version_id2).first()
-    if not version1 or not version2:
-        raise HTTPException(status_code=404, detail="Version not found")
-    diff = DeepDiff(version1.data, version2.data, ignore_order=True).to_dict()
-    diff = make_json_serializable(diff)
-    return {"diff": diff}
\ No newline at end of file
+
+    async def load_diff():
+        version1, snapshot1 = await load_version(db, id, version_id1)
+        version2, snapshot2 = await load_version(db, id, version_id2)
+        if not version1 or not version2:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return {"diff": diff_snapshots(snapshot1, snapshot2)}
+
+    # Stored versions never change, so neither does their diff
+    return await read_immutable("event_diff", diff_cache_key(id, version_id1, version_id2), load_diff)
+
+def diff_cache_key(event_id, version1, version2):
+    return f"immutable:diff:{DIFF_FORMAT}:{event_id}:{version1}:{version2}"
\ No newline at end of file
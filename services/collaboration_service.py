@@ -1,39 +1,81 @@
 from fastapi import HTTPException, status
-from models import Event
+from sqlalchemy import select, delete, func, bindparam, literal, cast, any_, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from models.permission import EventPermission, RoleEnum
-from schemas.permission import ShareEventRequest, PermissionResponse, UpdatePermissionRequest
+from services.access import resolve_access
+from schemas.permission import ShareEventRequest, UnshareEventRequest, PermissionResponse, UpdatePermissionRequest
+from services.cache import invalidate_user_lists, invalidate_event
 
 # Service to share an event with other users
-def share_event_service(id, share_req, db, current_user):
-    event = db.query(Event).filter(Event.id == id).first()
-    if not event or event.owner_id != current_user.id:
+async def share_event_service(id, share_req, db, current_user):
+    event, role = await resolve_access(db, id, current_user.id)
+    if role != RoleEnum.owner:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Permission denied or event not found")
-    
-    for user in share_req.users:
-        permission = db.query(EventPermission).filter_by(event_id=id, user_id=user.user_id).first()
-        if permission:
-            # Update existing permission
-            permission.role = user.role
-        else:
-            # Create new permission
-            new_permission = EventPermission(event_id=id, user_id=user.user_id, role=user.role)
-            db.add(new_permission)
-    db.commit()
+
+    # A user listed twice keeps the last role, an upsert cannot touch the same row twice
+    roles = {user.user_id: user.role for user in share_req.users}
+    if roles:
+        await db.execute(upsert_permissions(id, roles))
+    await db.commit()
+
+    # The event now appears in the lists of the users it was shared with
+    await invalidate_user_lists(*roles)
+    await invalidate_event(id)
 
     # Fetch updated permissions
-    permissions = db.query(EventPermission).filter_by(event_id=id).all()
+    permissions = (await db.scalars(select(EventPermission).filter_by(event_id=id))).all()
+    return [PermissionResponse.model_validate({**perm.__dict__}) for perm in permissions]
+
+
+# One INSERT ... ON CONFLICT DO UPDATE for the whole list: the rows come from two array
+# parameters, so the statement and its round trip stay the same size for any number of users
+def upsert_permissions(event_id, roles):
+    shared = func.unnest(
+        bindparam("user_ids", list(roles), type_=ARRAY(Integer)),
+        bindparam("roles", [role.name for role in roles.values()], type_=ARRAY(String)),
+    ).table_valued("user_id", "role").render_derived()
+    stmt = pg_insert(EventPermission).from_select(
+        ["event_id", "user_id", "role"],
+        select(literal(event_id), shared.c.user_id, cast(shared.c.role, EventPermission.role.type)),
+    )
+    return stmt.on_conflict_do_update(
+        constraint="uq_event_permissions_event_user",
+        set_={"role": stmt.excluded.role},
+    )
+
+
+# Service to revoke the permissions of several users in one statement
+async def unshare_event_service(id, unshare_req, db, current_user):
+    event, role = await resolve_access(db, id, current_user.id)
+    if role != RoleEnum.owner:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the owner can remove permissions")
+
+    revoked = []
+    if unshare_req.user_ids:
+        revoked = (await db.scalars(
+            delete(EventPermission)
+            .where(
+                EventPermission.event_id == id,
+                EventPermission.user_id == any_(bindparam("user_ids", unshare_req.user_ids, type_=ARRAY(Integer))),
+            )
+            .returning(EventPermission.user_id)
+        )).all()
+    await db.commit()
+
+    # Only users who actually lost access need their cached lists dropped
+    if revoked:
+        await invalidate_user_lists(*revoked)
+        await invalidate_event(id)
+
+    permissions = (await db.scalars(select(EventPermission).filter_by(event_id=id))).all()
     return [PermissionResponse.model_validate({**perm.__dict__}) for perm in permissions]
 
 
 # Service to get all permissions for an event
-def get_event_permissions_service(id, db, current_user):
-    event = db.query(Event).filter(Event.id == id).first()
+async def get_event_permissions_service(id, db, current_user):
     # Check if the event exists, and if the user is the owner or has any permission to the event
-    has_permission = (event and (
-        event.owner_id == current_user.id or
-        db.query(EventPermission).filter_by(event_id=id, user_id=current_user.id).first()
-    ))
-    if not has_permission:
+    event, role = await resolve_access(db, id, current_user.id)
+    if role is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied")
     
     # Owner as a virtual permission
@@ -41,36 +83,41 @@ def get_event_permissions_service(id, db, current_user):
         PermissionResponse(user_id=event.owner_id, role=RoleEnum.owner)
     ]
     
-    db_permission = db.query(EventPermission).filter_by(event_id=id).all()
+    db_permission = (await db.scalars(select(EventPermission).filter_by(event_id=id))).all()
     permissions += [PermissionResponse.model_validate({**perm.__dict__}) for perm in db_permission]
     return permissions
 
 
 # Service to update an existing permission for a user for an event
-def update_user_permission_service(id, user_id, update_req, db, current_user):
-    event = db.query(Event).filter(Event.id == id).first()
-    if not event or event.owner_id != current_user.id:
+async def update_user_permission_service(id, user_id, update_req, db, current_user):
+    event, role = await resolve_access(db, id, current_user.id)
+    if role != RoleEnum.owner:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Only the owner can update permissions")
     
-    permission = db.query(EventPermission).filter_by(event_id=id, user_id=user_id).first()
+    permission = await db.scalar(select(EventPermission).filter_by(event_id=id, user_id=user_id))
     if not permission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Permission not found")
     permission.role = update_req.role
-    db.commit()
-    db.refresh(permission)
+    await db.commit()
+    await db.refresh(permission)
+    await invalidate_event(id)
     return PermissionResponse.model_validate({**permission.__dict__})
 
 
 # Service to remove a user's permission for an event
-def remove_user_permission_service(id, user_id, db, current_user):
-    event = db.query(Event).filter(Event.id == id).first()
-    if not event or event.owner_id != current_user.id:
+async def remove_user_permission_service(id, user_id, db, current_user):
+    event, role = await resolve_access(db, id, current_user.id)
+    if role != RoleEnum.owner:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the owner can remove permissions")
     
-    permission = db.query(EventPermission).filter_by(event_id=id, user_id=user_id).first()
+    permission = await db.scalar(select(EventPermission).filter_by(event_id=id, user_id=user_id))
     if not permission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Permission not found")
     
-    db.delete(permission)
-    db.commit()
+    await db.delete(permission)
+    await db.commit()
+
+    # The user must no longer be served the event from their cached lists or copies
+    await invalidate_user_lists(user_id)
+    await invalidate_event(id)
     return
\ No newline at end of file
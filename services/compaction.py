@@ -0,0 +1,286 @@
+"""
+Moves old event versions and changelog entries out of the hot tables into one compressed
+archive row per run and event. The newest VERSION_RETENTION_COUNT versions of an event, and
+anything younger than VERSION_RETENTION_DAYS, stay in event_versions and event_changelog.
+Archived versions stay readable through services.version_store.load_version, so they can
+still be fetched, diffed and rolled back to, and archived changelog entries are still returned
+by the changelog endpoint.
+
+Usage (from the repository root, with a configured .env):
+    python -m services.compaction [--event ID] [--dry-run]
+    python -m services.compaction --restore ID
+
+Set COMPACTION_INTERVAL_SECONDS to also run it periodically from the API workers.
+"""
+import argparse
+import asyncio
+import json
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, func, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from auth.config import settings
+from database.connection import AsyncSessionLocal
+from models import EventVersion, EventChangelog, EventVersionArchive
+from services.redis_client import async_redis_client
+from services.version_store import load_version, apply_delta, pack_archive, unpack_archive
+from services import metrics
+
+KEEP_VERSIONS = max(1, settings.version_retention_count)
+KEEP_DAYS = settings.version_retention_days
+# Only one worker compacts at a time
+COMPACTION_LOCK_TIMEOUT = 600
+
+_compaction_task = None
+
+
+def archived(version_column, event_column):
+    return exists().where(
+        EventVersionArchive.event_id == event_column,
+        EventVersionArchive.first_version <= version_column,
+        EventVersionArchive.last_version >= version_column,
+    )
+
+
+async def events_to_compact(db, cutoff, event_id=None):
+    """Returns (event_id, last version to archive) for every event with versions past retention."""
+    ranked = select(
+        EventVersion.event_id,
+        EventVersion.version,
+        EventVersion.changed_at,
+        func.row_number().over(partition_by=EventVersion.event_id, order_by=EventVersion.version.desc()).label("rank"),
+    ).where(EventVersion.event_id.is_not(None), ~archived(EventVersion.version, EventVersion.event_id))
+    if event_id is not None:
+        ranked = ranked.where(EventVersion.event_id == event_id)
+    ranked = ranked.subquery()
+    rows = await db.execute(
+        select(ranked.c.event_id, func.max(ranked.c.version))
+        .where(ranked.c.rank > KEEP_VERSIONS, ranked.c.changed_at < cutoff)
+        .group_by(ranked.c.event_id)
+    )
+    return rows.all()
+
+
+def version_entry(row, snapshot):
+    return {
+        "id": row.id,
+        "version": row.version,
+        "data": snapshot,
+        "changed_by": row.changed_by,
+        "changed_at": row.changed_at.isoformat() if row.changed_at else None,
+        "change_note": row.change_note,
+    }
+
+
+def changelog_entry(row):
+    return {
+        "id": row.id,
+        "version_id": row.version_id,
+        "diff": row.diff,
+        "changed_by": row.changed_by,
+        "changed_at": row.changed_at.isoformat() if row.changed_at else None,
+    }
+
+
+async def compact_event(db, event_id, last_version):
+    """
+    Archives the event's hot versions up to last_version with their changelog entries, in the
+    caller's transaction. Returns the counts and sizes moved, or None when nothing was left.
+    """
+    rows = (await db.scalars(
+        select(EventVersion)
+        .where(
+            EventVersion.event_id == event_id,
+            EventVersion.version <= last_version,
+            ~archived(EventVersion.version, EventVersion.event_id),
+        )
+        .order_by(EventVersion.version, EventVersion.id)
+        .with_for_update()
+    )).all()
+    if not rows:
+        return None
+
+    # Archives hold full snapshots, so any archived version is read without its neighbours
+    _, snapshot = await load_version(db, event_id, rows[0].version)
+    snapshots = [snapshot]
+    for row in rows[1:]:
+        snapshot = dict(row.data) if row.is_keyframe else apply_delta(snapshot, row.data)
+        snapshots.append(snapshot)
+
+    # The oldest version left in the hot table must not be a delta on an archived one
+    next_row = await db.scalar(
+        select(EventVersion)
+        .where(EventVersion.event_id == event_id, EventVersion.version > rows[-1].version)
+        .order_by(EventVersion.version, EventVersion.id)
+        .limit(1)
+        .with_for_update()
+    )
+    if next_row is not None and not next_row.is_keyframe:
+        next_row.data = apply_delta(snapshot, next_row.data)
+        next_row.is_keyframe = True
+
+    changelog = (await db.scalars(
+        select(EventChangelog)
+        .where(EventChangelog.event_id == event_id, EventChangelog.changed_at <= rows[-1].changed_at)
+        .order_by(EventChangelog.changed_at, EventChangelog.id)
+    )).all()
+
+    blob = pack_archive(
+        [version_entry(row, snapshot) for row, snapshot in zip(rows, snapshots)],
+        [changelog_entry(row) for row in changelog],
+    )
+    raw_bytes = sum(len(json.dumps(row.data)) for row in rows) + sum(len(json.dumps(row.diff)) for row in changelog)
+    db.add(EventVersionArchive(
+        event_id=event_id,
+        first_version=rows[0].version,
+        last_version=rows[-1].version,
+        version_count=len(rows),
+        changelog_count=len(changelog),
+        changelog_first_at=changelog[0].changed_at if changelog else None,
+        changelog_last_at=changelog[-1].changed_at if changelog else None,
+        data=blob,
+    ))
+    if changelog:
+        await db.execute(delete(EventChangelog).where(EventChangelog.id.in_([row.id for row in changelog])))
+
+    # Changelog rows written before version_id pointed at the right event can still reference these
+    # versions; those stay in the hot table as full snapshots so no chain depends on archived rows
+    version_ids = [row.id for row in rows]
+    referenced = set(await db.scalars(select(EventChangelog.version_id).where(EventChangelog.version_id.in_(version_ids))))
+    for row, snapshot in zip(rows, snapshots):
+        if row.id in referenced:
+            row.data = snapshot
+            row.is_keyframe = True
+    removable = [version_id for version_id in version_ids if version_id not in referenced]
+    if removable:
+        await db.execute(delete(EventVersion).where(EventVersion.id.in_(removable)))
+
+    return {
+        "event_id": event_id,
+        "versions": len(removable),
+        "changelog": len(changelog),
+        "raw_bytes": raw_bytes,
+        "archived_bytes": len(blob),
+    }
+
+
+async def compact(event_id=None, dry_run=False, report=None):
+    """Compacts every event past retention, one transaction per event, and returns the totals."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=KEEP_DAYS)
+    async with AsyncSessionLocal() as db:
+        candidates = await events_to_compact(db, cutoff, event_id)
+
+    totals = {"events": 0, "versions": 0, "changelog": 0, "raw_bytes": 0, "archived_bytes": 0}
+    for candidate_id, last_version in candidates:
+        async with AsyncSessionLocal() as db:
+            stats = await compact_event(db, candidate_id, last_version)
+            if dry_run:
+                await db.rollback()
+            else:
+                await db.commit()
+        if stats is None:
+            continue
+        if report:
+            report(stats)
+        totals["events"] += 1
+        for key in ("versions", "changelog", "raw_bytes", "archived_bytes"):
+            totals[key] += stats[key]
+
+    if not dry_run:
+        metrics.inc("version_compaction_runs_total")
+        metrics.inc("version_compaction_rows_total", totals["versions"], table="event_versions")
+        metrics.inc("version_compaction_rows_total", totals["changelog"], table="event_changelog")
+    return totals
+
+
+async def restore_event(db, event_id):
+    """Moves every archive of the event back into the hot tables, versions as keyframes. Returns the rows restored."""
+    archives = (await db.scalars(
+        select(EventVersionArchive).where(EventVersionArchive.event_id == event_id).order_by(EventVersionArchive.first_version)
+    )).all()
+    versions, changelog = [], []
+    for archive in archives:
+        content = unpack_archive(archive.data)
+        versions += [
+            {**entry, "event_id": event_id, "is_keyframe": True, "changed_at": datetime.fromisoformat(entry["changed_at"]) if entry["changed_at"] else None}
+            for entry in content["versions"]
+        ]
+        changelog += [
+            {**entry, "event_id": event_id, "changed_at": datetime.fromisoformat(entry["changed_at"]) if entry["changed_at"] else None}
+            for entry in content["changelog"]
+        ]
+    # Versions kept hot because something referenced them are already there under the same id
+    if versions:
+        await db.execute(pg_insert(EventVersion).on_conflict_do_nothing(index_elements=["id"]), versions)
+    if changelog:
+        await db.execute(pg_insert(EventChangelog).on_conflict_do_nothing(index_elements=["id"]), changelog)
+    await db.execute(delete(EventVersionArchive).where(EventVersionArchive.event_id == event_id))
+    return len(versions), len(changelog)
+
+
+async def _compact_periodically():
+    while True:
+        await asyncio.sleep(settings.compaction_interval_seconds)
+        lock = async_redis_client.lock("lock:version_compaction", timeout=COMPACTION_LOCK_TIMEOUT, blocking=False)
+        try:
+            if await lock.acquire():
+                try:
+                    # compact() records its totals in metrics
+                    await compact()
+                finally:
+                    with suppress(Exception):
+                        await lock.release()
+        except Exception as error:
+            print("Error compacting versions:", error)
+
+
+async def start_compaction():
+    global _compaction_task
+    if settings.compaction_interval_seconds > 0:
+        _compaction_task = asyncio.create_task(_compact_periodically())
+
+
+async def stop_compaction():
+    global _compaction_task
+    if _compaction_task is not None:
+        _compaction_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _compaction_task
+        _compaction_task = None
+
+
+def print_event(stats):
+    print(
+        f"event {stats['event_id']}: {stats['versions']} versions, {stats['changelog']} changelog entries, "
+        f"{stats['raw_bytes']:,} bytes -> {stats['archived_bytes']:,} bytes"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Archive event versions past retention")
+    parser.add_argument("--event", type=int, help="only compact this event")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be archived without changing anything")
+    parser.add_argument("--restore", type=int, metavar="ID", help="move the archives of this event back into the hot tables")
+    args = parser.parse_args()
+
+    if args.restore is not None:
+        async with AsyncSessionLocal() as db:
+            versions, changelog = await restore_event(db, args.restore)
+            await db.commit()
+        print(f"event {args.restore}: restored {versions} versions and {changelog} changelog entries")
+        return
+
+    totals = await compact(args.event, args.dry_run, report=print_event)
+    saved = totals["raw_bytes"] - totals["archived_bytes"]
+    ratio = saved / totals["raw_bytes"] if totals["raw_bytes"] else 0
+    print(
+        f"{'Would archive' if args.dry_run else 'Archived'} {totals['versions']} versions and {totals['changelog']} "
+        f"changelog entries of {totals['events']} events: {totals['raw_bytes']:,} bytes of JSON stored in "
+        f"{totals['archived_bytes']:,} bytes ({ratio:.1%} reclaimed)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
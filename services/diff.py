@@ -0,0 +1,73 @@
+import re
+from datetime import datetime
+
+# Field-level diff between two event snapshots, as stored in event_changelog.diff:
+#   {"format": 1, "fields": {"title": {"old": "Standup", "new": "Daily standup"}, ...}}
+# A field added in the new snapshot has no "old" and a removed one has no "new".
+# Changelog rows written before this format hold DeepDiff output and are converted on read.
+
+DIFF_FORMAT = 1
+# Snapshots store datetimes as ISO strings, asyncpg only binds datetime objects
+DATETIME_FIELDS = {"start_time", "end_time", "created_at", "updated_at"}
+
+_MISSING = object()
+_DEEPDIFF_PATH = re.compile(r"^root\['([^']*)'\]$")
+
+
+def _comparable(field, value):
+    if field in DATETIME_FIELDS and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _stored(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def diff_snapshots(old, new):
+    """Returns the changed fields of `new` relative to `old`, ready to be stored as JSON."""
+    fields = {}
+    for field in old.keys() | new.keys():
+        before, after = old.get(field, _MISSING), new.get(field, _MISSING)
+        if before == after:
+            continue
+        # The same instant can be written differently, e.g. "Z" or "+00:00"
+        if before is not _MISSING and after is not _MISSING and _comparable(field, before) == _comparable(field, after):
+            continue
+        change = {}
+        if before is not _MISSING:
+            change["old"] = _stored(before)
+        if after is not _MISSING:
+            change["new"] = _stored(after)
+        fields[field] = change
+    return {"format": DIFF_FORMAT, "fields": dict(sorted(fields.items()))}
+
+
+def empty_diff():
+    return {"format": DIFF_FORMAT, "fields": {}}
+
+
+def _field_name(path):
+    match = _DEEPDIFF_PATH.match(path)
+    return match.group(1) if match else path
+
+
+def normalize_diff(diff):
+    """Reads a stored diff in either format and returns it in the current one."""
+    if not diff:
+        return empty_diff()
+    if "format" in diff:
+        return diff
+    # Legacy DeepDiff.to_dict() output on flat snapshots
+    fields = {}
+    for section in ("values_changed", "type_changes"):
+        for path, change in diff.get(section, {}).items():
+            fields[_field_name(path)] = {"old": change.get("old_value"), "new": change.get("new_value")}
+    # DeepDiff only kept the paths of added and removed keys, their values are unknown
+    for section in ("dictionary_item_added", "dictionary_item_removed"):
+        for path in diff.get(section, ()):
+            fields[_field_name(path)] = {}
+    return {"format": DIFF_FORMAT, "fields": dict(sorted(fields.items()))}
@@ -1,14 +1,38 @@
+from sqlalchemy import and_, or_, select, insert, update, delete, union, tuple_
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException, status
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import base64
+import heapq
 import json
 
 from schemas.event import EventOccurence, EventCreate, EventResponse
-from models import EventPermission, Event, EventVersion, EventChangelog, RoleEnum
-from services.redis_client import redis_client
-
-from deepdiff import DeepDiff
-from dateutil.rrule import rrulestr
+from models import EventPermission, Event, EventVersion, EventChangelog, EventOccurrence, RoleEnum
+from services.cache import (
+    EVENT_CACHE_TTL,
+    LIST_CACHE_TTL,
+    cache_get,
+    cache_set,
+    jittered,
+    read_through,
+    local_get,
+    local_set,
+    event_tag,
+    user_tag,
+    event_audience,
+    event_cache_key,
+    list_cache_key,
+    invalidate_user_lists,
+    invalidate_event,
+)
+from services.access import resolve_access
+from services.version_store import allocate_version, build_version, load_version
+from services.diff import DATETIME_FIELDS, diff_snapshots, empty_diff
+from services.recurrence import compile_rule, rule_limits, first_occurrences, next_occurrence, occurrences_between
+from auth.config import settings
+
+from dateutil.rrule import rrule
 
 
 # Function to ensure that the datetime is in UTC
@@ -22,10 +46,9 @@ def ensure_utc(dt):
 def expand_occurrences(event: Event, count: int = 10):
     if event.is_recurring and event.recurrence_pattern:
         start_time = ensure_utc(event.start_time)
-        rule = rrulestr(event.recurrence_pattern, dtstart=start_time)
         # Generate up to `count` occurences
         occurrences = []
-        for dt in list(rule[:count]):
+        for dt in first_occurrences(event.recurrence_pattern, start_time, count):
             occurrences.append(EventOccurence(
                 start_time=dt,
                 end_time=dt + (event.end_time - event.start_time)
@@ -40,11 +63,8 @@ def expand_occurrences_until(event: Event, until: datetime):
     until = ensure_utc(until)
     if event.is_recurring and event.recurrence_pattern:
         start_time = ensure_utc(event.start_time)
-        rule = rrulestr(event.recurrence_pattern, dtstart=start_time)
         occurrences = []
-        for dt in rule:
-            if dt > until:
-                break
+        for dt in occurrences_between(event.recurrence_pattern, start_time, start_time, until, inc=True):
             occurrences.append(EventOccurence(
                 start_time=dt,
                 end_time=dt + (event.end_time - event.start_time)
@@ -53,35 +73,285 @@ def expand_occurrences_until(event: Event, until: datetime):
     else:
         return [EventOccurence(start_time=event.start_time, end_time=event.end_time)]
 
-def has_event_conflict(db, user_id, start_time, end_time, exclude_event_id=None):
+def expand_occurrences_starting_between(event: Event, start: datetime, end: datetime):
+    """Expand the occurrences of an event that start within [start, end)."""
+    start = ensure_utc(start)
+    end = ensure_utc(end)
+    event_start = ensure_utc(event.start_time)
+    duration = ensure_utc(event.end_time) - event_start
+    if event.is_recurring and event.recurrence_pattern:
+        starts = [dt for dt in occurrences_between(event.recurrence_pattern, event_start, start, end, inc=True) if dt < end]
+    elif start <= event_start < end:
+        starts = [event_start]
+    else:
+        starts = []
+    return [EventOccurence(start_time=dt, end_time=dt + duration) for dt in starts]
+
+
+def compute_event_span(event: Event):
+    """
+    Returns the (span_start, span_end) range covered by every occurrence of the event.
+    span_end is None when the recurrence has no COUNT or UNTIL and never ends.
+    """
+    start_time = ensure_utc(event.start_time)
+    end_time = ensure_utc(event.end_time)
+    if not (event.is_recurring and event.recurrence_pattern):
+        return start_time, end_time
+    duration = end_time - start_time
+    rule = compile_rule(event.recurrence_pattern, start_time)
+    count, until = rule_limits(event.recurrence_pattern)
+    if not isinstance(rule, rrule) or (count is None and until is None):
+        return start_time, None
+    if until is not None:
+        return start_time, max(end_time, ensure_utc(until) + duration)
+    last = None
+    for last in rule:
+        pass
+    return start_time, max(end_time, last + duration) if last else end_time
+
+
+def refresh_event_span(event: Event):
+    event.span_start, event.span_end = compute_event_span(event)
+
+
+def span_overlaps(start_time, end_time):
+    """SQL predicate matching events whose span overlaps the given time range, open-ended when end_time is None."""
+    # Rows written before spans existed have NULL bounds and are always candidates
+    ends_after = or_(Event.span_end.is_(None), Event.span_end > start_time)
+    if end_time is None:
+        return ends_after
+    return and_(or_(Event.span_start.is_(None), Event.span_start < end_time), ends_after)
+
+
+def visible_event_ids(user_id):
+    """Subquery of the ids of events owned by or shared with the user."""
+    owned_ids = select(Event.id).where(Event.owner_id == user_id)
+    shared_ids = select(EventPermission.event_id).where(EventPermission.user_id == user_id)
+    return owned_ids.union(shared_ids)
+
+
+OCCURRENCE_HORIZON = timedelta(days=settings.occurrence_horizon_days)
+# Stored occurrences are extended once they fall a quarter horizon behind, not on every request
+OCCURRENCE_REFRESH = OCCURRENCE_HORIZON * 3 / 4
+
+def occurrence_target(span_end: datetime):
+    """Returns the instant up to which the occurrences of an event with the given span are stored."""
+    target = datetime.now(timezone.utc) + OCCURRENCE_HORIZON
+    if span_end is not None:
+        # Finite series ending inside the horizon are materialized completely
+        target = min(target, ensure_utc(span_end))
+    return target
+
+
+def needs_occurrences_until(until: datetime):
+    """
+    SQL predicate matching events whose materialized occurrences stop before `until`, or
+    before the end of their span when `until` is None.
+    """
+    incomplete = or_(Event.span_end.is_(None), Event.occurrences_until < Event.span_end)
+    if until is not None:
+        incomplete = and_(Event.occurrences_until < until, incomplete)
+    return or_(Event.occurrences_until.is_(None), incomplete)
+
+
+async def insert_occurrences(db, event: Event, start: datetime, end: datetime):
+    rows = [
+        {"event_id": event.id, "occurrence_start": occ.start_time, "occurrence_end": occ.end_time}
+        for occ in expand_occurrences_starting_between(event, start, end)
+    ]
+    if rows:
+        await db.execute(insert(EventOccurrence), rows)
+
+
+def delete_occurrences(event_id):
+    return delete(EventOccurrence).where(EventOccurrence.event_id == event_id).execution_options(synchronize_session=False)
+
+
+async def rebuild_event_occurrences(db, event: Event):
+    """Replace the materialized occurrences of a single event, up to the rolling horizon."""
+    await db.execute(delete_occurrences(event.id))
+    target = occurrence_target(event.span_end)
+    await insert_occurrences(db, event, event.span_start or event.start_time, target)
+    event.occurrences_until = target
+
+
+async def ensure_occurrences(db, event_filter, until: datetime):
+    """
+    Lazily extends the materialized occurrences of the matching events that stop before `until`,
+    never past the rolling horizon, in the caller's transaction. Only write paths call it;
+    occurrences past the horizon are found in memory by the queries that need them.
+    Returns the number of events extended.
+    """
+    needed = min(ensure_utc(until), datetime.now(timezone.utc) + OCCURRENCE_REFRESH)
+    stale_events = (await db.scalars(select(Event).where(event_filter, needs_occurrences_until(needed)))).all()
+    extended = 0
+    for event in stale_events:
+        current = event.occurrences_until
+        if event.span_start is None:
+            refresh_event_span(event)
+        target = occurrence_target(event.span_end)
+        # Claim the extension so concurrent requests do not insert the same occurrences twice
+        claim = await db.execute(
+            update(Event)
+            .where(
+                Event.id == event.id,
+                Event.occurrences_until.is_(None) if current is None else Event.occurrences_until == current,
+            )
+            .values(occurrences_until=target, span_start=event.span_start, span_end=event.span_end)
+            .execution_options(synchronize_session=False)
+        )
+        if not claim.rowcount:
+            continue
+        if current is None:
+            await db.execute(delete_occurrences(event.id))
+            await insert_occurrences(db, event, event.span_start, target)
+        else:
+            await insert_occurrences(db, event, current, target)
+        extended += 1
+    return extended
+
+
+# Columns needed to expand an event's occurrences without loading the whole row
+OCCURRENCE_COLUMNS = (Event.id, Event.start_time, Event.end_time, Event.is_recurring, Event.recurrence_pattern)
+
+async def unmaterialized_events(db, event_filter, until: datetime):
+    """Rows of the matching events whose stored occurrences stop before `until` (None: before their span ends)."""
+    until = ensure_utc(until) if until is not None else None
+    return (await db.execute(select(*OCCURRENCE_COLUMNS).where(event_filter, needs_occurrences_until(until)))).all()
+
+
+def first_occurrence_after(event, after: datetime, inc: bool = False):
+    """Returns the first occurrence of the event starting after `after` (or at it when inc), or None."""
+    after = ensure_utc(after)
+    event_start = ensure_utc(event.start_time)
+    duration = ensure_utc(event.end_time) - event_start
+    if event.is_recurring and event.recurrence_pattern:
+        start = next_occurrence(event.recurrence_pattern, event_start, after, inc)
+    elif event_start > after or (inc and event_start == after):
+        start = event_start
+    else:
+        start = None
+    return None if start is None else EventOccurence(start_time=start, end_time=start + duration)
+
+
+def overlaps_occurrence(event, start: datetime, end: datetime):
+    """True when an occurrence of the event overlaps [start, end), without expanding the series."""
+    duration = ensure_utc(event.end_time) - ensure_utc(event.start_time)
+    # Only the first occurrence ending after `start` can be the earliest overlap
+    occurrence = first_occurrence_after(event, ensure_utc(start) - duration)
+    return occurrence is not None and occurrence.start_time < ensure_utc(end)
+
+
+def occurs_within(event, start: datetime, end: datetime):
+    """
+    True when an occurrence of the event lies inside the list filter range: starting at or after
+    `start` and, when given, ending by `end`.
+    """
+    occurrence = first_occurrence_after(event, start or event.start_time, inc=True)
+    if occurrence is None:
+        return False
+    return end is None or occurrence.end_time <= ensure_utc(end)
+
+
+async def has_event_conflict(db, user_id, start_time, end_time, exclude_event_id=None):
     """
     Returns True if the given time range conflicts with any event (including recurring) for the user.
+    Runs as a range scan over the materialized occurrences of the events whose span overlaps the range.
     """
     start_time = ensure_utc(start_time)
     end_time = ensure_utc(end_time)
-    # Events owned by the user
-    owned_query = db.query(Event).filter(Event.owner_id == user_id)
-    # Events shared with the user
-    shared_event_ids = db.query(EventPermission.event_id).filter(EventPermission.user_id == user_id)
-    shared_query = db.query(Event).filter(Event.id.in_(shared_event_ids))
-    # Combine both queries
-    query = owned_query.union(shared_query)
+    candidates = and_(Event.id.in_(visible_event_ids(user_id)), span_overlaps(start_time, end_time))
     if exclude_event_id:
-        query = query.filter(Event.id != exclude_event_id)
-    events = query.all()
-    for event in events:
-        # Expand occurrences up to the end_time of the new/updated event
-        for occ in expand_occurrences_until(event, end_time):
-            if occ.start_time < end_time and occ.end_time > start_time:
-                return True
-    return False
+        candidates = and_(candidates, Event.id != exclude_event_id)
+    await ensure_occurrences(db, candidates, end_time)
+    candidate_ids = select(Event.id).where(candidates)
+    conflict = await db.scalar(select(EventOccurrence.id).where(
+        EventOccurrence.event_id.in_(candidate_ids),
+        EventOccurrence.occurrence_start < end_time,
+        EventOccurrence.occurrence_end > start_time,
+    ).limit(1))
+    if conflict is not None:
+        return True
+    # Occurrences past the stored horizon are checked in memory
+    unmaterialized = await unmaterialized_events(db, candidates, end_time)
+    return any(overlaps_occurrence(event, start_time, end_time) for event in unmaterialized)
+
+
+def find_overlapping_pairs(existing, incoming):
+    """
+    Sort-and-sweep over (start, end, key) intervals in O((n+m) log(n+m) + k).
+    Returns every (key, key) pair that overlaps, except pairs of two existing intervals.
+    """
+    intervals = [(start, end, False, key) for start, end, key in existing]
+    intervals += [(start, end, True, key) for start, end, key in incoming]
+    intervals.sort(key=lambda interval: (interval[0], interval[1]))
+    active_existing, active_incoming = [], []
+    pairs = []
+    for seq, (start, end, is_incoming, key) in enumerate(intervals):
+        # Ends are exclusive, so intervals ending at this start no longer overlap
+        for active in (active_existing, active_incoming):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+        if is_incoming:
+            pairs.extend((other, key) for _, _, other in active_existing)
+        pairs.extend((other, key) for _, _, other in active_incoming)
+        heapq.heappush(active_incoming if is_incoming else active_existing, (end, seq, key))
+    return pairs
+
+
+async def find_batch_conflicts(db, user_id, events):
+    """
+    Checks a batch of new events against the user's calendar and against each other in one pass.
+    Returns a description of every conflicting pair.
+    """
+    incoming = [
+        (ensure_utc(event.start_time), ensure_utc(event.end_time), ("new", index))
+        for index, event in enumerate(events)
+    ]
+    if not incoming:
+        return []
+    window_start = min(start for start, _, _ in incoming)
+    window_end = max(end for _, end, _ in incoming)
+
+    # Load the existing occurrences overlapping the whole batch window once
+    candidates = and_(Event.id.in_(visible_event_ids(user_id)), span_overlaps(window_start, window_end))
+    await ensure_occurrences(db, candidates, window_end)
+    rows = (await db.execute(select(EventOccurrence.event_id, EventOccurrence.occurrence_start, EventOccurrence.occurrence_end).where(
+        EventOccurrence.event_id.in_(select(Event.id).where(candidates)),
+        EventOccurrence.occurrence_start < window_end,
+        EventOccurrence.occurrence_end > window_start,
+    ))).all()
+    existing = [(ensure_utc(start), ensure_utc(end), ("existing", event_id)) for event_id, start, end in rows]
+    pairs = find_overlapping_pairs(existing, incoming)
+    # Occurrences past the stored horizon are checked in memory against each new event
+    for event in await unmaterialized_events(db, candidates, window_end):
+        pairs += [(("existing", event.id), key) for start, end, key in incoming if overlaps_occurrence(event, start, end)]
+
+    conflicts = []
+    # A recurring event can overlap the same new event through several occurrences
+    for first, second in dict.fromkeys(pairs):
+        if second[0] == "existing":
+            first, second = second, first
+        title = events[second[1]].title
+        if first[0] == "existing":
+            conflicts.append(f"'{title}' conflicts with existing event {first[1]}")
+        else:
+            conflicts.append(f"'{events[first[1]].title}' conflicts with '{title}' in the batch")
+    return conflicts
 
     
+# Columns derived from other fields, kept out of version snapshots
+NON_VERSIONED_FIELDS = {"span_start", "span_end", "occurrences_until", "current_version"}
+
 # Helper function to convert event to dictionary for response
 def event_to_dict(event):
+    return values_to_dict(event.__dict__)
+
+# Same conversion for a plain mapping of column values
+def values_to_dict(values):
     result = {}
-    for k, v in event.__dict__.items():
-        if k.startswith('_'):
+    for k, v in values.items():
+        if k.startswith('_') or k in NON_VERSIONED_FIELDS:
             continue
         if isinstance(v, datetime):
             result[k] = v.isoformat()
@@ -100,7 +370,8 @@ def make_json_serializable(obj):
     else:
         return obj
     
-DATETIME_FIELDS = {"start_time", "end_time"}
+# Fields that change when and how often an event occurs
+TIMING_FIELDS = {"start_time", "end_time", "is_recurring", "recurrence_pattern"}
 
 def assign_version_data_to_event(event, data):
     for key, value in data.items():
@@ -113,11 +384,11 @@ def assign_version_data_to_event(event, data):
 
 
 # Create a new event and handle conflicts
-def create_event_service(event: EventCreate, db, current_user):
+async def create_event_service(event: EventCreate, db, current_user):
     if event.start_time >= event.end_time:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="End time must be after start time")
     
-    if has_event_conflict(db, current_user.id, event.start_time, event.end_time):
+    if await has_event_conflict(db, current_user.id, event.start_time, event.end_time):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Event time conflicts with an existing event")
     try:
         db_event = Event(
@@ -128,10 +399,13 @@ def create_event_service(event: EventCreate, db, current_user):
             location=event.location,
             is_recurring=event.is_recurring,
             recurrence_pattern=event.recurrence_pattern,
-            owner_id=current_user.id
+            owner_id=current_user.id,
+            current_version=1
         )
+        refresh_event_span(db_event)
         db.add(db_event)
-        db.flush()  # To get db_event.id
+        await db.flush()  # To get db_event.id
+        await rebuild_event_occurrences(db, db_event)
 
         initial_version = EventVersion(
             event_id=db_event.id,
@@ -141,164 +415,247 @@ def create_event_service(event: EventCreate, db, current_user):
             change_note="Initial version"
         )
         db.add(initial_version)
-        db.flush()  # Ensure the version is created before changelog
+        await db.flush()  # Ensure the version is created before changelog
 
         changelog_entry = EventChangelog(
             event_id=db_event.id,
-            version_id=1,
-            diff={},
+            version_id=initial_version.id,
+            diff=empty_diff(),
             changed_by=current_user.id,
         )
         db.add(changelog_entry)
-        db.commit()
+        await db.commit()
         occurences = expand_occurrences(db_event)
         
-        # Invalidate cache for all events of the user
-        pattern = f"events:user:{current_user.id}:*"
-        for key in redis_client.scan_iter(pattern):
-            redis_client.delete(key)
+        # Invalidate cached lists of the user and any cached 404 for the new id
+        await invalidate_user_lists(current_user.id)
+        await invalidate_event(db_event.id)
         
         return EventResponse.model_validate({**db_event.__dict__, "occurences": occurences})
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print("Error creating event:", e)
         raise HTTPException(status_code=500, detail="Failed to create event")
     
 
+# Insert new events with their initial version, changelog entry and occurrences using set-based statements
+async def insert_events_bulk(db, events, owner_id):
+    if not events:
+        return []
+    # One multi-row INSERT ... RETURNING instead of a flush per event
+    rows = []
+    for event in events:
+        span_start, span_end = compute_event_span(event)
+        rows.append({
+            "title": event.title,
+            "description": event.description,
+            "start_time": event.start_time,
+            "end_time": event.end_time,
+            "location": event.location,
+            "is_recurring": event.is_recurring,
+            "recurrence_pattern": event.recurrence_pattern,
+            "owner_id": owner_id,
+            "span_start": span_start,
+            "span_end": span_end,
+            "occurrences_until": occurrence_target(span_end),
+            "current_version": 1,
+        })
+    inserted = (await db.execute(
+        insert(Event).returning(Event.id, Event.created_at, sort_by_parameter_order=True), rows
+    )).all()
+
+    created_events, version_rows, changelog_rows, occurrence_rows = [], [], [], []
+    for event, row, (event_id, created_at) in zip(events, rows, inserted):
+        row.update(id=event_id, created_at=created_at)
+        version_rows.append({
+            "event_id": event_id,
+            "version": 1,
+            "data": values_to_dict(row),
+            "changed_by": owner_id,
+            "change_note": "Initial version",
+        })
+        changelog_rows.append({
+            "event_id": event_id,
+            "diff": empty_diff(),
+            "changed_by": owner_id,
+        })
+        for occ in expand_occurrences_starting_between(event, row["span_start"], row["occurrences_until"]):
+            occurrence_rows.append({"event_id": event_id, "occurrence_start": occ.start_time, "occurrence_end": occ.end_time})
+        created_events.append(EventResponse.model_validate({**row, "occurences": expand_occurrences(event)}))
+
+    version_ids = (await db.scalars(
+        insert(EventVersion).returning(EventVersion.id, sort_by_parameter_order=True), version_rows
+    )).all()
+    for changelog_row, version_id in zip(changelog_rows, version_ids):
+        changelog_row["version_id"] = version_id
+    await db.execute(insert(EventChangelog), changelog_rows)
+    if occurrence_rows:
+        await db.execute(insert(EventOccurrence), occurrence_rows)
+    return created_events
+
+
 # Function to create Batch of events
-def batch_create_events_service(batch, db, current_user):
-    created_events = []
+async def batch_create_events_service(batch, db, current_user):
     try:
         # First check for conflicts across all events in the batch
         for event in batch.events:
             if event.start_time >= event.end_time:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="End time must be after start time")
-            
-            if has_event_conflict(db, current_user.id, event.start_time, event.end_time):
-                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Event time conflicts with an existing event: {event.title}")
-
-        for event in batch.events:
-            db_event = Event(
-                title=event.title,
-                description=event.description,
-                start_time=event.start_time,
-                end_time=event.end_time,
-                location=event.location,
-                is_recurring=event.is_recurring,
-                recurrence_pattern=event.recurrence_pattern,
-                owner_id=current_user.id
-            )
-            db.add(db_event)
-            db.flush()
-
-            initial_version = EventVersion(
-                event_id=db_event.id,
-                version=1,
-                data=event_to_dict(db_event),
-                changed_by=current_user.id,
-                change_note="Initial version"
-            )
-            db.add(initial_version)
 
-            changelog_entry = EventChangelog(
-                event_id=db_event.id,
-                version_id=1,
-                diff={},
-                changed_by=current_user.id,
-            )
-            db.add(changelog_entry)
+        conflicts = await find_batch_conflicts(db, current_user.id, batch.events)
+        if conflicts:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Event time conflicts: " + "; ".join(conflicts))
 
-            occurences = expand_occurrences(db_event)
-            created_events.append(EventResponse.model_validate({**db_event.__dict__, "occurences": occurences}))
-        db.commit()
+        created_events = await insert_events_bulk(db, batch.events, current_user.id)
+        await db.commit()
         
-        # Invalidate cache for all events of the user
-        pattern = f"events:user:{current_user.id}:*"
-        for key in redis_client.scan_iter(pattern):
-            redis_client.delete(key)
+        # Invalidate cached lists of the user and any cached 404s for the new ids
+        await invalidate_user_lists(current_user.id)
+        await invalidate_event(*(event.id for event in created_events))
         return created_events
     
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print("Error creating events batch:", e)
         raise HTTPException(status_code=500, detail="Failed to create events batch")
     
 
 # Function to get event by ID with permission checks
-def get_event_service(id, db, current_user):
-    cache_key = f"event:{id}:user:{current_user.id}"
-    cached = redis_client.get(cache_key)
-    if cached:
-        # Deserialize the cached data
-        return EventResponse.model_validate(json.loads(cached))
-    
-    db_event = db.query(Event).filter(Event.id == id).first()
-    if not db_event:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
-    
-    if db_event.owner_id != current_user.id:
-        permission = db.query(EventPermission).filter_by(event_id=id, user_id=current_user.id).first()
-        if not permission:
+async def get_event_service(id, db, current_user):
+    local_key = ("event", id, current_user.id)
+    local_tags = (event_tag(id),)
+    event_response, epoch = local_get("event", local_key)
+    if event_response is not None:
+        return event_response
+
+    async def load_event():
+        db_event, role = await resolve_access(db, id, current_user.id)
+        if not db_event:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+        if role is None:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have to access this event")
-    
-    occurences = expand_occurrences(db_event)
-    event_response = EventResponse.model_validate({**db_event.__dict__, "occurences": occurences})
-    # Cache the event response for 5 minutes
-    redis_client.setex(cache_key, 300, event_response.model_dump_json())  # Cache for 5 minutes
+
+        occurences = expand_occurrences(db_event)
+        return EventResponse.model_validate({**db_event.__dict__, "occurences": occurences})
+
+    # Cache the event response for about 5 minutes; misses for the same key share one load
+    event_response = await read_through(
+        "event",
+        await event_cache_key(id, current_user.id),
+        load_event,
+        dump=lambda response: response.model_dump(mode="json"),
+        parse=EventResponse.model_validate,
+        ttl=EVENT_CACHE_TTL,
+    )
+    local_set(local_key, event_response, local_tags, epoch)
     return event_response
 
+# Opaque keyset cursor over the (start_time, id) ordering of event lists
+def encode_cursor(event):
+    payload = json.dumps({"start_time": ensure_utc(event.start_time).isoformat(), "id": event.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["start_time"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 
 # Function to get all events with optional filters
-def list_events_service(db, current_user, skip, limit, is_recurring, search, start_date, end_date):
-    cache_key = f"events:user:{current_user.id}:skip:{skip}:limit:{limit}:recurring:{is_recurring}:search:{search}:start_date:{start_date}:end_date:{end_date}"
-    cached = redis_client.get(cache_key)
+async def list_events_service(db, current_user, skip, limit, is_recurring, search, start_date, end_date, cursor=None):
+    params = dict(
+        skip=skip, limit=limit, cursor=cursor, recurring=is_recurring,
+        search=search, start_date=start_date, end_date=end_date,
+    )
+    local_key = ("event_list", current_user.id, *params.values())
+    local_tags = (user_tag(current_user.id),)
+    page, epoch = local_get("event_list", local_key)
+    if page is not None:
+        return page
+
+    cache_key = await list_cache_key(current_user.id, **params)
+    cached = await cache_get("event_list", cache_key)
     
     if cached:
         # Deserialize the cached data
-        return [EventResponse.model_validate(event) for event in json.loads(cached)]
-    
-    # Events owned by the current user
-    owned_query = db.query(Event).filter(Event.owner_id == current_user.id)
-    # Events shared with the current user
-    shared_event_ids = db.query(EventPermission.event_id).filter(EventPermission.user_id == current_user.id)
-    shared_query = db.query(Event).filter(Event.id.in_(shared_event_ids))
-
-    # Combine both queries
-    query = owned_query.union(shared_query)
+        cached_page = json.loads(cached)
+        page = [EventResponse.model_validate(event) for event in cached_page["events"]], cached_page["next_cursor"]
+        local_set(local_key, page, local_tags, epoch)
+        return page
 
+    criteria = []
     if is_recurring is not None:
-        query = query.filter(Event.is_recurring == is_recurring)
+        criteria.append(Event.is_recurring == is_recurring)
     if search:
-        query = query.filter(
+        criteria.append(
             (Event.title.ilike(f"%{search}%")) | 
             (Event.description.ilike(f"%{search}%"))
         )
 
-    # Filter by start and end dates
-    if start_date:
-        query = query.filter(Event.start_time >= start_date)
-    if end_date:
-        query = query.filter(Event.end_time <= end_date)
+    # Filter by start and end dates, matching any occurrence of the event inside the range
+    if start_date or end_date:
+        occurrence_query = select(EventOccurrence.event_id)
+        if start_date:
+            occurrence_query = occurrence_query.where(EventOccurrence.occurrence_start >= start_date)
+        if end_date:
+            occurrence_query = occurrence_query.where(EventOccurrence.occurrence_end <= end_date)
+        until = ensure_utc(end_date) if end_date else None
+        candidates = Event.id.in_(visible_event_ids(current_user.id))
+        if start_date:
+            candidates = and_(candidates, span_overlaps(ensure_utc(start_date), until))
+        # Reads never extend the stored occurrences: events not already matched by them and stored
+        # short of the range, or of their span when it is open-ended, are matched in memory
+        unmatched = and_(candidates, Event.id.not_in(occurrence_query))
+        matched_ids = [
+            event.id for event in await unmaterialized_events(db, unmatched, until)
+            if occurs_within(event, start_date, end_date)
+        ]
+        if matched_ids:
+            criteria.append(or_(Event.id.in_(occurrence_query), Event.id.in_(matched_ids)))
+        else:
+            criteria.append(Event.id.in_(occurrence_query))
 
-    events = query.offset(skip).limit(limit).all()
+    # Events owned by the current user
+    owned_query = select(Event).where(Event.owner_id == current_user.id, *criteria)
+    # Events shared with the current user
+    shared_event_ids = select(EventPermission.event_id).where(EventPermission.user_id == current_user.id)
+    shared_query = select(Event).where(Event.id.in_(shared_event_ids), *criteria)
+
+    order = (Event.start_time, Event.id)
+    if cursor:
+        # Keyset pagination: each branch seeks past the cursor on the (owner_id, start_time, id) index
+        after = tuple_(Event.start_time, Event.id) > tuple_(*decode_cursor(cursor))
+        owned_query = owned_query.where(after).order_by(*order).limit(limit)
+        shared_query = shared_query.where(after).order_by(*order).limit(limit)
+    visible = aliased(Event, union(owned_query, shared_query).subquery())
+    query = select(visible).order_by(visible.start_time, visible.id)
+    if not cursor:
+        query = query.offset(skip)
+
+    events = (await db.scalars(query.limit(limit))).all()
 
     if not events:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No events found")
-    return [
+    next_cursor = encode_cursor(events[-1]) if len(events) == limit else None
+    event_responses = [
         EventResponse.model_validate({**event.__dict__, "occurences": expand_occurrences(event)})
         for event in events
     ]
+    cached_page = {"events": [event.model_dump(mode="json") for event in event_responses], "next_cursor": next_cursor}
+    await cache_set("event_list", cache_key, json.dumps(cached_page), jittered(LIST_CACHE_TTL))
+    local_set(local_key, (event_responses, next_cursor), local_tags, epoch)
+    return event_responses, next_cursor
 
 
 # Function to update an existing event
-def update_event_service(id, event_update, db, current_user):
-    db_event = db.query(Event).filter(Event.id == id).first()
+async def update_event_service(id, event_update, db, current_user):
+    db_event, role = await resolve_access(db, id, current_user.id)
     if not db_event:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
-    if db_event.owner_id != current_user.id:
-        permission = db.query(EventPermission).filter_by(event_id=id, user_id=current_user.id, role=RoleEnum.editor).first()
-        if not permission:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have access to update this event")
+    if role not in (RoleEnum.owner, RoleEnum.editor):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have access to update this event")
     try:
         update_data = event_update.model_dump(exclude_unset=True)
         if "start_time" in update_data or "end_time" in update_data:
@@ -306,23 +663,28 @@ def update_event_service(id, event_update, db, current_user):
             new_end = update_data.get("end_time", db_event.end_time)
             if new_start >= new_end:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="End time must be after start time")
-            if has_event_conflict(db, current_user.id, new_start, new_end, exclude_event_id=id):
+            if await has_event_conflict(db, current_user.id, new_start, new_end, exclude_event_id=id):
                 raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Event time conflicts with an existing event")
         for key, value in update_data.items():
             setattr(db_event, key, value)
-        db.flush()
-        latest_version = db.query(EventVersion).filter_by(event_id=id).order_by(EventVersion.version.desc()).first()
-        next_version_number = (latest_version.version if latest_version else 0) + 1
-        new_version = EventVersion(
-            event_id=id,
-            version=next_version_number,
-            data=event_to_dict(db_event),
+        if TIMING_FIELDS & update_data.keys():
+            refresh_event_span(db_event)
+            await rebuild_event_occurrences(db, db_event)
+        await db.flush()
+        next_version_number = await allocate_version(db, id)
+        latest_version, latest_snapshot = await load_version(db, id)
+        snapshot = event_to_dict(db_event)
+        new_version = build_version(
+            id,
+            next_version_number,
+            snapshot,
+            latest_snapshot,
             changed_by=current_user.id,
             change_note="Updated event"
         )
         db.add(new_version)
-        diff = DeepDiff(latest_version.data, new_version.data, ignore_order=True).to_dict() if latest_version else {}
-        diff = make_json_serializable(diff)
+        await db.flush()  # The changelog entry references the version's id
+        diff = diff_snapshots(latest_snapshot, snapshot) if latest_version else empty_diff()
         changelog_entry = EventChangelog(
             event_id=id,
             version_id=new_version.id,
@@ -330,35 +692,36 @@ def update_event_service(id, event_update, db, current_user):
             changed_by=current_user.id,
         )
         db.add(changelog_entry)
-        db.commit()
+        await db.commit()
         occurences = expand_occurrences(db_event)
 
-        # Invalidate cache for all events of the user
-        pattern = f"events:user:{current_user.id}:*"
-        for key in redis_client.scan_iter(pattern):
-            redis_client.delete(key)
+        # Invalidate cached lists of everyone who can see the event and every cached copy of it
+        await invalidate_user_lists(*await event_audience(db, id, db_event.owner_id))
+        await invalidate_event(id)
 
         return EventResponse.model_validate({**db_event.__dict__, "occurences": occurences})
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print("Error updating event:", e)
         raise HTTPException(status_code=500, detail="Failed to update event")
     
 
 # Function to delete an event
-def delete_event_service(id, db, current_user):
-    db_event = db.query(Event).filter(Event.id == id).first()
+async def delete_event_service(id, db, current_user):
+    db_event, role = await resolve_access(db, id, current_user.id)
     if not db_event:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
-    if db_event.owner_id != current_user.id:
+    if role != RoleEnum.owner:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have access to delete this event")
     
-    db.delete(db_event)
-    db.commit()
-
-    # Invalidate cache for all events of the user
-    pattern = f"events:user:{current_user.id}:*"
-    for key in redis_client.scan_iter(pattern):
-        redis_client.delete(key)
+    # Collaborators are looked up before the delete detaches their permissions
+    audience = await event_audience(db, id, db_event.owner_id)
+    await db.execute(delete_occurrences(id))
+    await db.delete(db_event)
+    await db.commit()
+
+    # Invalidate cached lists of everyone who could see the event and every cached copy of it
+    await invalidate_user_lists(*audience)
+    await invalidate_event(id)
 
     return {"detail": "Event deleted successfully"}
\ No newline at end of file
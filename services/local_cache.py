@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import suppress
+
+from auth.config import settings
+from services.redis_client import async_redis_client
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class LocalCache:
+    """
+    Bounded LRU cache with a per-entry TTL, held in the memory of one worker.
+    Entries are tagged so that every entry derived from an event or a user can be dropped at once.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        # Invalidations are numbered so a reader can detect one of its tags being invalidated
+        # while it computed a value: tag -> number of its latest invalidation, oldest first
+        self._clock = 0
+        self._invalidated = OrderedDict()
+        # Invalidations forgotten to bound memory, and clears, count against every tag
+        self._floor = 0
+
+    @property
+    def epoch(self):
+        return self._clock
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, tags=(), epoch=None, ttl=None):
+        with self._lock:
+            if epoch is not None and self._invalidated_since(epoch, tags):
+                # Computed from data that was invalidated meanwhile
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._clock += 1
+            for tag in tags:
+                self._invalidated.pop(tag, None)
+                self._invalidated[tag] = self._clock
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+            while len(self._invalidated) > self.maxsize:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, forgotten)
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._invalidated.clear()
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _invalidated_since(self, epoch, tags):
+        if self._floor > epoch:
+            return True
+        return any(self._invalidated.get(tag, 0) > epoch for tag in tags)
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class InMemoryBroker:
+    """Delivers invalidations to subscribers in the same process, stands in for Redis in tests."""
+
+    def __init__(self):
+        self._handlers = []
+
+    async def publish(self, tags):
+        for handler in list(self._handlers):
+            handler(tags)
+
+    async def subscribe(self, handler):
+        self._handlers.append(handler)
+
+    async def close(self):
+        self._handlers.clear()
+
+
+class RedisBroker:
+    """Fans invalidations out to every worker over a Redis pub/sub channel."""
+
+    def __init__(self, client, channel=INVALIDATION_CHANNEL):
+        self.client = client
+        self.channel = channel
+        self._task = None
+
+    async def publish(self, tags):
+        await self.client.publish(self.channel, json.dumps(list(tags)))
+
+    async def subscribe(self, handler):
+        self._task = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler):
+        while True:
+            try:
+                async with self.client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        handler(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Messages may have been lost while disconnected, drop everything rather than serve stale entries
+                handle_invalidation(None)
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+local_cache = LocalCache(settings.local_cache_size, settings.local_cache_ttl_seconds)
+broker = InMemoryBroker() if settings.cache_broker == "memory" else RedisBroker(async_redis_client)
+
+
+# Other in-process state kept in sync through the invalidation channel, called with the
+# received tags, or with None when messages may have been lost
+_invalidation_handlers = []
+
+def on_invalidation(handler):
+    _invalidation_handlers.append(handler)
+    return handler
+
+
+def handle_invalidation(tags):
+    if tags is None:
+        local_cache.clear()
+    else:
+        local_cache.invalidate(*tags)
+    for handler in _invalidation_handlers:
+        handler(tags)
+
+
+# Subscribe this worker's local cache to invalidations published by all workers
+async def start_invalidation_listener():
+    await broker.subscribe(handle_invalidation)
+
+
+async def stop_invalidation_listener():
+    await broker.close()
+
+
+async def publish_invalidation(*tags):
+    # Apply locally right away, other workers catch up through the broker
+    local_cache.invalidate(*tags)
+    await broker.publish(tags)
@@ -0,0 +1,91 @@
+import threading
+from collections import defaultdict
+
+# In-process metrics registry, rendered in the Prometheus text format by GET /metrics
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_histograms = {}
+_collectors = []
+
+
+def _series_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+# Increment a counter, e.g. inc("cache_requests_total", cache="event", result="hit")
+def inc(name, amount=1, **labels):
+    with _lock:
+        _counters[_series_key(name, labels)] += amount
+
+
+# Set a gauge to an absolute value
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_series_key(name, labels)] = value
+
+
+# Record a sample in a histogram with cumulative buckets
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    key = _series_key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def register_collector(collector):
+    """
+    Register a callable evaluated at scrape time. It returns an iterable of
+    (name, labels, value) gauge samples, for values owned by another component.
+    """
+    _collectors.append(collector)
+    return collector
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def render_prometheus():
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        counters = sorted(_counters.items())
+        gauges = dict(_gauges)
+        histograms = sorted((key, dict(h, counts=list(h["counts"]))) for key, h in _histograms.items())
+
+    for collector in _collectors:
+        for name, labels, value in collector():
+            gauges[_series_key(name, labels)] = value
+
+    for (name, labels), value in counters:
+        declare(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        declare(name, "gauge")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), histogram in histograms:
+        declare(name, "histogram")
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
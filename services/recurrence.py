@@ -0,0 +1,96 @@
+from datetime import timedelta
+from functools import lru_cache
+
+from dateutil.parser import isoparse
+from dateutil.rrule import rrule, rrulestr
+
+from auth.config import settings
+from services.metrics import register_collector
+
+# Frequencies whose periods have a fixed length, so a series can be advanced by whole periods
+FIXED_PERIODS = {
+    "WEEKLY": timedelta(weeks=1),
+    "DAILY": timedelta(days=1),
+    "HOURLY": timedelta(hours=1),
+    "MINUTELY": timedelta(minutes=1),
+    "SECONDLY": timedelta(seconds=1),
+}
+
+
+# Parse an RFC 5545 recurrence once per (pattern, dtstart); rrule objects are immutable and safe to share
+@lru_cache(maxsize=settings.rrule_cache_size)
+def compile_rule(pattern, dtstart):
+    return rrulestr(pattern, dtstart=dtstart)
+
+
+# Rule parameters are read from the rule text, never from the parsed rule's private attributes
+@lru_cache(maxsize=settings.rrule_cache_size)
+def rule_terms(pattern):
+    """Returns the terms of the pattern's RRULE as a mapping of upper-cased names to their text."""
+    terms = {}
+    for line in pattern.splitlines():
+        name, _, value = line.strip().rpartition(":")
+        if name and name.upper() != "RRULE":
+            continue
+        for term in value.split(";"):
+            key, _, argument = term.partition("=")
+            if key.strip():
+                terms[key.strip().upper()] = argument.strip()
+    return terms
+
+
+def rule_limits(pattern):
+    """Returns the (count, until) terms of the pattern's RRULE, each None when absent."""
+    terms = rule_terms(pattern)
+    count = int(terms["COUNT"]) if "COUNT" in terms else None
+    until = isoparse(terms["UNTIL"]) if "UNTIL" in terms else None
+    return count, until
+
+
+def jump_ahead(rule, pattern, dtstart, after):
+    """
+    Returns a rule producing the same occurrences from `after` onwards, with its dtstart moved
+    forward by whole periods so iteration does not start at the beginning of a long series.
+    """
+    terms = rule_terms(pattern)
+    # COUNT is relative to the first occurrence, RRULE sets have no single period,
+    # and a DTSTART in the text takes precedence over the one passed in
+    if not isinstance(rule, rrule) or "COUNT" in terms or "DTSTART" in pattern.upper():
+        return rule
+    period = FIXED_PERIODS.get(terms.get("FREQ", "").upper())
+    if period is None:
+        return rule
+    step = period * int(terms.get("INTERVAL") or 1)
+    # rrule drops the microseconds of its dtstart
+    dtstart = dtstart.replace(microsecond=0)
+    periods = (after - dtstart) // step
+    if periods <= 0:
+        return rule
+    return rule.replace(dtstart=dtstart + periods * step)
+
+
+def occurrences_between(pattern, dtstart, start, end, inc=False):
+    """Occurrence start times between start and end; cost depends on the window, not the series age."""
+    rule = compile_rule(pattern, dtstart)
+    return jump_ahead(rule, pattern, dtstart, start).between(start, end, inc=inc)
+
+
+def next_occurrence(pattern, dtstart, after, inc=False):
+    """First occurrence start after `after`, or None; like occurrences_between it skips the series' past."""
+    rule = compile_rule(pattern, dtstart)
+    return jump_ahead(rule, pattern, dtstart, after).after(after, inc=inc)
+
+
+def first_occurrences(pattern, dtstart, count):
+    return list(compile_rule(pattern, dtstart)[:count])
+
+
+def rule_cache_metrics():
+    info = compile_rule.cache_info()
+    return [
+        ("rrule_cache_hits", {}, info.hits),
+        ("rrule_cache_misses", {}, info.misses),
+        ("rrule_cache_entries", {}, info.currsize),
+    ]
+
+register_collector(rule_cache_metrics)
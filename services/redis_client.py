@@ -1,7 +1,10 @@
 import redis
+import redis.asyncio
 from auth.config import settings
 
 # Initialize Redis client
 REDIS_URL = settings.redis_url
 redis_client = redis.from_url(REDIS_URL, decode_responses=True)
 
+# Client awaited by the request handlers
+async_redis_client = redis.asyncio.from_url(REDIS_URL, decode_responses=True)
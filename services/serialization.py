@@ -0,0 +1,74 @@
+import json
+from contextvars import ContextVar
+
+import msgpack
+import orjson
+from fastapi.responses import JSONResponse
+
+from auth.config import settings
+
+# Responses are encoded once, straight to the format negotiated from the Accept header:
+# msgpack when asked for, otherwise JSON written by orjson. Set JSON_RENDERER=json to use
+# the standard library encoder instead.
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+# Media type negotiated for the request being handled, set by the negotiation middleware
+_negotiated_media_type = ContextVar("negotiated_media_type", default=JSON_MEDIA_TYPE)
+
+
+# Suffix of each representation's strong ETag: the same content encoded as msgpack is a different body
+ETAG_SUFFIXES = {JSON_MEDIA_TYPE: "", MSGPACK_MEDIA_TYPE: "-mp"}
+
+
+def negotiate(accept):
+    return MSGPACK_MEDIA_TYPE if MSGPACK_MEDIA_TYPE in (accept or "") else JSON_MEDIA_TYPE
+
+
+def set_negotiated_media_type(accept):
+    _negotiated_media_type.set(negotiate(accept))
+
+
+def representation_etag(etag):
+    """Returns the ETag of the negotiated representation of content whose JSON ETag is `etag`."""
+    suffix = ETAG_SUFFIXES[_negotiated_media_type.get()]
+    return f'{etag[:-1]}{suffix}"' if suffix else etag
+
+
+def render_json_stdlib(content):
+    # Same output as starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def render_json_orjson(content):
+    return orjson.dumps(content)
+
+
+def render_msgpack(content):
+    return msgpack.packb(content, use_bin_type=True)
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    Default response class: FastAPI hands it the validated, JSON-compatible content and it is
+    rendered once in the negotiated format.
+    """
+
+    json_renderer = staticmethod(render_json_orjson if settings.json_renderer == "orjson" else render_json_stdlib)
+
+    def __init__(self, content, status_code=200, headers=None, media_type=None, background=None):
+        if media_type is None:
+            media_type = _negotiated_media_type.get()
+        super().__init__(content, status_code, headers, media_type, background)
+
+    async def __call__(self, scope, receive, send):
+        # Caches must key the body on the format it was negotiated for. Set on sending, after FastAPI
+        # has merged in the route's headers, so a route's own Vary (immutable_headers) replaces it
+        self.headers.setdefault("vary", "Accept")
+        await super().__call__(scope, receive, send)
+
+    def render(self, content):
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return render_msgpack(content)
+        return self.json_renderer(content)
@@ -1,53 +1,73 @@
 from fastapi import HTTPException, status
-from models import Event, EventVersion, EventPermission, EventChangelog
-from deepdiff import DeepDiff
-from services.event_service import assign_version_data_to_event
+from models import EventChangelog, RoleEnum
+from services.access import resolve_access, resolve_role
+from services.version_store import allocate_version, build_version, load_version
+from services.diff import diff_snapshots, empty_diff
+from services.event_service import assign_version_data_to_event, refresh_event_span, rebuild_event_occurrences
 from schemas.version import EventVersionSchema
+from services.cache import event_audience, invalidate_user_lists, invalidate_event, read_immutable
 
 # Service to retrieve the version history of an event
-def get_event_version_service(id, version_id, db, current_user):
-    version = db.query(EventVersion).filter_by(event_id=id, version=version_id).first()
-    if not version:
-        raise HTTPException(status_code=404, detail="Version not found")
-    
-    # Permission check (owner or shared with other users)
-    event = db.query(Event).filter(Event.id == id).first()
-    if not event or (event.owner_id != current_user.id and not db.query(EventPermission).filter_by(event_id = id, user_id = current_user.id).first()):
+# Returns the version as JSON-compatible data and its ETag
+async def get_event_version_service(id, version_id, db, current_user):
+    # Permission check (owner or shared with other users), before anything is loaded or cached
+    if await resolve_role(db, id, current_user.id) is None:
         raise HTTPException(status_code=403, detail="Permission denied")
-    return EventVersionSchema.model_validate(version)
+
+    async def load_event_version():
+        version, snapshot = await load_version(db, id, version_id)
+        if not version:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return version_response(version, snapshot).model_dump(mode="json")
+
+    # Stored versions never change, only the permission check runs on every call
+    return await read_immutable("event_version", version_cache_key(id, version_id), load_event_version)
+
+def version_cache_key(event_id, version):
+    return f"immutable:version:{event_id}:{version}"
+
+# Versions are returned with their full snapshot, whichever way they are stored
+def version_response(version, snapshot):
+    return EventVersionSchema.model_validate({**version_fields(version), "data": snapshot})
+
+def version_fields(version):
+    return {field: getattr(version, field) for field in EventVersionSchema.model_fields}
 
 # Service to rollback an event to a specific version
-def rollback_event_service(id, version_id, db, current_user):
+async def rollback_event_service(id, version_id, db, current_user):
     try:
-        version = db.query(EventVersion).filter_by(event_id=id, version=version_id).first()
+        # Only the owner may roll back, checked before any version is rebuilt
+        event, role = await resolve_access(db, id, current_user.id)
+        if role != RoleEnum.owner:
+            raise HTTPException(status_code=403, detail="Permission denied")
+
+        version, snapshot = await load_version(db, id, version_id)
         if not version:
             raise HTTPException(status_code=404, detail="Version not found")
-        
-        event = db.query(Event).filter(Event.id == id).first()
-        if not event or event.owner_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Permission denied")
-        
+
         # Overwrite event fields with the version data
-        assign_version_data_to_event(event, version.data)
-        db.flush()
+        assign_version_data_to_event(event, snapshot)
+        refresh_event_span(event)
+        await rebuild_event_occurrences(db, event)
+        await db.flush()
 
-        latest_version = db.query(EventVersion).filter_by(event_id=id).order_by(EventVersion.version.desc()).first()
-        next_version_number = (latest_version.version if latest_version else 0) + 1
+        next_version_number = await allocate_version(db, id)
+        latest_version, latest_snapshot = await load_version(db, id)
 
         # Create a new version entry for the rollback
-        new_version = EventVersion(
-            event_id=id,
-            version=next_version_number,
-            data=version.data,
+        new_version = build_version(
+            id,
+            next_version_number,
+            snapshot,
+            latest_snapshot,
             changed_by=current_user.id,
             change_note="Rolled back to version {}".format(version.version)
         )
         db.add(new_version)
-        db.flush()
+        await db.flush()
 
         # Create a changelog entry for the rollback
-        prev_version = latest_version
-        diff = DeepDiff(prev_version.data, new_version.data, ignore_order=True).to_dict() if prev_version else {}
+        diff = diff_snapshots(latest_snapshot, snapshot) if latest_version else empty_diff()
         change_log_entry = EventChangelog(
             event_id=id,
             version_id=new_version.id,
@@ -55,10 +75,14 @@ def rollback_event_service(id, version_id, db, current_user):
             changed_by=current_user.id,
         )
         db.add(change_log_entry)
-        db.commit()
-        db.refresh(new_version)
-        return EventVersionSchema.model_validate(new_version)
+        await db.commit()
+        await db.refresh(new_version)
+
+        # Invalidate cached lists of everyone who can see the event and every cached copy of it
+        await invalidate_user_lists(*await event_audience(db, id, event.owner_id))
+        await invalidate_event(id)
+        return version_response(new_version, snapshot)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print("Error during rollback:", e)
         raise HTTPException(status_code=500, detail="Failed to rollback event")
\ No newline at end of file
@@ -0,0 +1,112 @@
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select, update, func
+
+from auth.config import settings
+from models import Event, EventVersion, EventVersionArchive
+
+# Event versions are stored as field-level deltas against the previous version, with a full
+# snapshot (keyframe) every VERSION_KEYFRAME_INTERVAL versions. Rows written before deltas
+# existed are all keyframes. A version is rebuilt from its nearest keyframe and at most
+# VERSION_KEYFRAME_INTERVAL - 1 deltas, fetched in one query. Versions moved out by
+# services.compaction are read back from their archive.
+
+KEYFRAME_INTERVAL = max(1, settings.version_keyframe_interval)
+# Key of a delta listing the fields removed since the previous version, never a column name
+UNSET_KEY = "$unset"
+
+
+def is_keyframe_version(number):
+    return (number - 1) % KEYFRAME_INTERVAL == 0
+
+
+def make_delta(previous, current):
+    delta = {key: value for key, value in current.items() if key not in previous or previous[key] != value}
+    removed = [key for key in previous if key not in current]
+    if removed:
+        delta[UNSET_KEY] = removed
+    return delta
+
+
+def apply_delta(snapshot, delta):
+    result = {**snapshot, **delta}
+    for key in result.pop(UNSET_KEY, ()):
+        result.pop(key, None)
+    return result
+
+
+def build_version(event_id, number, snapshot, previous_snapshot, **fields):
+    """A new EventVersion row for `snapshot`, stored as a delta unless it is due a keyframe."""
+    keyframe = previous_snapshot is None or is_keyframe_version(number)
+    data = snapshot if keyframe else make_delta(previous_snapshot, snapshot)
+    return EventVersion(event_id=event_id, version=number, data=data, is_keyframe=keyframe, **fields)
+
+
+async def allocate_version(db, event_id):
+    """
+    Returns the next version number of the event by incrementing the counter on its row. The row
+    stays locked until the transaction ends, so concurrent edits of an event get consecutive numbers.
+    Rows without a counter yet start from their highest stored version, the latest is never archived.
+    """
+    latest = select(func.coalesce(func.max(EventVersion.version), 0)).where(EventVersion.event_id == Event.id).scalar_subquery()
+    return await db.scalar(
+        update(Event)
+        .where(Event.id == event_id)
+        .values(current_version=func.coalesce(Event.current_version, latest) + 1)
+        .returning(Event.current_version)
+    )
+
+
+async def load_version(db, event_id, number=None):
+    """
+    Returns (row, snapshot) for the given version of the event, or its latest version when
+    `number` is None, and (None, None) when there is no such version.
+    """
+    keyframe = select(func.max(EventVersion.version)).where(EventVersion.event_id == event_id, EventVersion.is_keyframe)
+    bounds = [EventVersion.event_id == event_id]
+    if number is not None:
+        keyframe = keyframe.where(EventVersion.version <= number)
+        bounds.append(EventVersion.version <= number)
+    chain = select(EventVersion).where(*bounds, EventVersion.version >= keyframe.scalar_subquery())
+    rows = (await db.scalars(chain.order_by(EventVersion.version, EventVersion.id))).all()
+    if not rows or (number is not None and rows[-1].version != number):
+        # The latest version is never archived
+        if number is None:
+            return None, None
+        return await load_archived_version(db, event_id, number)
+    snapshot = None
+    for row in rows:
+        snapshot = dict(row.data) if row.is_keyframe else apply_delta(snapshot, row.data)
+    return rows[-1], snapshot
+
+
+def pack_archive(versions, changelog):
+    return zlib.compress(json.dumps({"versions": versions, "changelog": changelog}, separators=(",", ":")).encode(), 9)
+
+
+def unpack_archive(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+async def load_archived_version(db, event_id, number):
+    """Same result as load_version for a version stored in an archive, as a detached EventVersion."""
+    archive = await db.scalar(
+        select(EventVersionArchive)
+        .where(
+            EventVersionArchive.event_id == event_id,
+            EventVersionArchive.first_version <= number,
+            EventVersionArchive.last_version >= number,
+        )
+        .order_by(EventVersionArchive.id.desc())
+        .limit(1)
+    )
+    if archive is None:
+        return None, None
+    for entry in unpack_archive(archive.data)["versions"]:
+        if entry["version"] == number:
+            changed_at = datetime.fromisoformat(entry["changed_at"]) if entry["changed_at"] else None
+            version = EventVersion(**{**entry, "changed_at": changed_at}, event_id=event_id, is_keyframe=True)
+            return version, dict(entry["data"])
+    return None, None
@@ -0,0 +1,114 @@
+"""
+Compares the set-based batch insert path with the previous per-row flush path.
+
+Usage (from the repository root, with a configured .env):
+    python -m testing.bench_batch_insert [database_url] [batch_size]
+
+Defaults to the configured PostgreSQL database and 1,000 events. Both paths run
+inside a transaction that is rolled back, so no data is kept. The server measured is
+printed with the results, since round trips dominate the per-row path.
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database.connection import Base, DATABASE_URL
+from models import User, Event, EventVersion, EventChangelog
+from schemas.event import EventCreate
+from services.event_service import (
+    insert_events_bulk,
+    event_to_dict,
+    expand_occurrences,
+    refresh_event_span,
+    rebuild_event_occurrences,
+)
+from schemas.event import EventResponse
+
+
+def make_events(count):
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    return [
+        EventCreate(
+            title=f"Imported event {i}",
+            description="Synced from an external calendar",
+            start_time=start + timedelta(hours=2 * i),
+            end_time=start + timedelta(hours=2 * i + 1),
+            location="Room 1",
+        )
+        for i in range(count)
+    ]
+
+
+# The batch path as it was before: one flush per event before its version and changelog rows
+async def insert_events_per_row(db, events, owner_id):
+    created_events = []
+    for event in events:
+        db_event = Event(
+            title=event.title,
+            description=event.description,
+            start_time=event.start_time,
+            end_time=event.end_time,
+            location=event.location,
+            is_recurring=event.is_recurring,
+            recurrence_pattern=event.recurrence_pattern,
+            owner_id=owner_id,
+        )
+        refresh_event_span(db_event)
+        db.add(db_event)
+        await db.flush()
+        await rebuild_event_occurrences(db, db_event)
+        db.add(EventVersion(event_id=db_event.id, version=1, data=event_to_dict(db_event), changed_by=owner_id, change_note="Initial version"))
+        db.add(EventChangelog(event_id=db_event.id, version_id=1, diff={}, changed_by=owner_id))
+        created_events.append(EventResponse.model_validate({**db_event.__dict__, "occurences": expand_occurrences(db_event)}))
+    await db.flush()
+    return created_events
+
+
+async def run(session_factory, insert, events, owner_id):
+    async with session_factory() as db:
+        try:
+            started = time.perf_counter()
+            await insert(db, events, owner_id)
+            await db.flush()
+            return time.perf_counter() - started
+        finally:
+            await db.rollback()
+
+
+async def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else DATABASE_URL
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    engine = create_async_engine(url.replace("postgresql://", "postgresql+asyncpg://", 1))
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async with session_factory() as db:
+        owner = User(username="bench-batch-insert", email="bench-batch-insert@example.com", password="-")
+        db.add(owner)
+        await db.commit()
+        owner_id = owner.id
+
+    try:
+        version = ".".join(map(str, engine.dialect.server_version_info or ()))
+        print(f"{engine.dialect.name} {version} at {engine.url.render_as_string(hide_password=True)}")
+        events = make_events(count)
+        # Warm up connections and statement caches
+        await run(session_factory, insert_events_per_row, events[:10], owner_id)
+        await run(session_factory, insert_events_bulk, events[:10], owner_id)
+        for name, insert in (("per-row flush", insert_events_per_row), ("bulk insert", insert_events_bulk)):
+            elapsed = min([await run(session_factory, insert, events, owner_id) for _ in range(3)])
+            print(f"{name:>14}: {count} events in {elapsed * 1000:.1f} ms ({count / elapsed:,.0f} events/s)")
+    finally:
+        async with session_factory() as db:
+            await db.execute(delete(User).where(User.id == owner_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
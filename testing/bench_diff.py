@@ -0,0 +1,55 @@
+"""
+Compares the event differ in services.diff with the DeepDiff call it replaced on the
+update, rollback and diff paths, and checks that legacy DeepDiff changelog rows read back
+as the same field changes.
+
+Usage (from the repository root, with a configured .env):
+    python -m testing.bench_diff [pairs]
+
+Defaults to 2,000 pairs of consecutive snapshots from the edit history generated by
+testing.bench_version_storage.
+"""
+import sys
+import time
+
+from deepdiff import DeepDiff
+
+from services.diff import diff_snapshots, normalize_diff
+from services.event_service import make_json_serializable
+from testing.bench_version_storage import make_history
+
+
+def deepdiff_path(old, new):
+    # What update_event_service stored before
+    return make_json_serializable(DeepDiff(old, new, ignore_order=True).to_dict())
+
+
+def measure(differ, pairs, rounds=3):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for old, new in pairs:
+            differ(old, new)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    history = make_history(count + 1)
+    pairs = list(zip(history, history[1:]))
+
+    for old, new in pairs:
+        assert normalize_diff(deepdiff_path(old, new)) == diff_snapshots(old, new)
+
+    legacy = measure(deepdiff_path, pairs)
+    current = measure(diff_snapshots, pairs)
+    print(f"{count} snapshot pairs, legacy rows verified to normalize to the new format")
+    print(f"  DeepDiff + make_json_serializable: {legacy / count * 1e6:8.1f} us per diff")
+    print(f"                     diff_snapshots: {current / count * 1e6:8.1f} us per diff")
+    print(f"                            speedup: {legacy / current:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
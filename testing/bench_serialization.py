@@ -0,0 +1,168 @@
+"""
+Compares response encoding through the previous msgpack middleware, which re-encoded the
+JSON body FastAPI had rendered, with NegotiatedResponse, which encodes each response once
+in the negotiated format.
+
+Usage (from the repository root, with a configured .env):
+    python -m testing.bench_serialization [events] [requests]
+
+Defaults to list responses of 1,000 events with 5 occurrences each and 200 requests per
+case. Requests go through the ASGI stack in process, so no database or server is needed;
+latency is the full request as seen by the client.
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import msgpack
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from schemas.event import EventResponse
+from schemas.response import APIResponse
+from services.serialization import NegotiatedResponse, set_negotiated_media_type, render_json_stdlib, render_json_orjson, render_msgpack
+
+
+def make_events(count):
+    start = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+    return [
+        EventResponse(
+            id=i,
+            title=f"Planning session {i}",
+            description="Quarterly roadmap review with the platform and product teams. " * 3,
+            start_time=start + timedelta(days=i),
+            end_time=start + timedelta(days=i, hours=1),
+            location="Room 4.12",
+            is_recurring=True,
+            recurrence_pattern="FREQ=WEEKLY;COUNT=5",
+            owner_id=17,
+            occurences=[
+                {"start_time": start + timedelta(days=i, weeks=week), "end_time": start + timedelta(days=i, weeks=week, hours=1)}
+                for week in range(5)
+            ],
+        )
+        for i in range(count)
+    ]
+
+
+def add_events_route(app, events):
+    @app.get("/events", response_model=APIResponse[list[EventResponse]])
+    async def list_events():
+        return APIResponse(success=True, message="Events fetched successfully", data=events)
+
+
+# The application as it was before: JSON rendered by FastAPI, then decoded and re-encoded
+def previous_app(events):
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.middleware("http")
+    async def msgpack_middleware(request: Request, call_next):
+        response = await call_next(request)
+        accept = request.headers.get("accept", "")
+        if "application/msgpack" in accept:
+            body = b""
+            async for chunk in response.body_iterator:
+                body += chunk
+            dict_data = json.loads(body)
+            msgpack_bytes = msgpack.packb(dict_data, use_bin_type=True)
+            return Response(content=msgpack_bytes, media_type="application/msgpack")
+        return response
+
+    add_events_route(app, events)
+    return app
+
+
+def negotiated_app(events, json_renderer=None):
+    response_class = NegotiatedResponse
+    if json_renderer is not None:
+        response_class = type("StdlibNegotiatedResponse", (NegotiatedResponse,), {"json_renderer": staticmethod(json_renderer)})
+    app = FastAPI(default_response_class=response_class)
+
+    @app.middleware("http")
+    async def content_negotiation_middleware(request: Request, call_next):
+        set_negotiated_media_type(request.headers.get("accept"))
+        return await call_next(request)
+
+    add_events_route(app, events)
+    return app
+
+
+async def measure(app, accept, requests):
+    latencies, total_bytes = [], 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up
+        for _ in range(5):
+            await client.get("/events", headers={"Accept": accept})
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            response = await client.get("/events", headers={"Accept": accept})
+            latencies.append(time.perf_counter() - request_started)
+            total_bytes += len(response.content)
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return total_bytes / elapsed, statistics.median(latencies), p99, total_bytes // requests
+
+
+def measure_encoding(encode, content, rounds=20):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encode(content)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def previous_msgpack(content):
+    # What the middleware did after JSONResponse had rendered the body
+    return msgpack.packb(json.loads(render_json_stdlib(content)), use_bin_type=True)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    events = make_events(count)
+
+    cases = [
+        ("previous json", previous_app(events), "application/json"),
+        ("previous msgpack", previous_app(events), "application/msgpack"),
+        ("stdlib json", negotiated_app(events, render_json_stdlib), "application/json"),
+        ("orjson", negotiated_app(events), "application/json"),
+        ("msgpack", negotiated_app(events), "application/msgpack"),
+    ]
+    # Every encoding must decode to the body the previous JSON path produced
+    expected = None
+    for _, app, accept in cases:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.get("/events", headers={"Accept": accept})
+        body = msgpack.unpackb(response.content) if accept == "application/msgpack" else json.loads(response.content)
+        if expected is None:
+            expected = body
+        assert body == expected
+
+    print(f"{count} events per response, {requests} requests per case, bodies verified to match")
+    print("Encoding only:")
+    encoders = [
+        ("previous msgpack", previous_msgpack),
+        ("stdlib json", render_json_stdlib),
+        ("orjson", render_json_orjson),
+        ("msgpack", render_msgpack),
+    ]
+    for name, encode in encoders:
+        print(f"{name:>18} {measure_encoding(encode, expected) * 1000:8.2f} ms")
+    print("Full requests:")
+    print(f"{'case':>18} {'body bytes':>11} {'MB/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, app, accept in cases:
+        throughput, p50, p99, size = await measure(app, accept, requests)
+        print(f"{name:>18} {size:>11,} {throughput / 1e6:>8.1f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Compares the size of an event's version history stored as full snapshots with the
+delta encoding of services.version_store, and times the reconstruction of every version.
+
+Usage (from the repository root, with a configured .env):
+    python -m testing.bench_version_storage [versions] [keyframe_interval]
+
+Defaults to 500 versions and the configured VERSION_KEYFRAME_INTERVAL. The history is
+generated in memory: an event with a long description, edited mostly in its title,
+location and times, with one edit in four rewriting part of the description. Sizes are
+the JSON documents stored in event_versions.data.
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import services.version_store as version_store
+from services.version_store import make_delta, apply_delta
+
+PARAGRAPH = (
+    "Agenda: review of the quarterly roadmap, status of the open incidents, hiring plan for "
+    "the platform team and a walkthrough of the new deployment pipeline. Please read the "
+    "linked design documents beforehand and add your questions to the shared notes. "
+)
+
+
+def make_history(count, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2030, 1, 6, 9, tzinfo=timezone.utc)
+    snapshot = {
+        "id": 4211,
+        "title": "Weekly planning",
+        "description": PARAGRAPH * 12,
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(hours=1)).isoformat(),
+        "location": "Room 4.12",
+        "is_recurring": True,
+        "recurrence_pattern": "FREQ=WEEKLY;BYDAY=MO",
+        "owner_id": 17,
+        "created_at": datetime(2029, 12, 1, tzinfo=timezone.utc).isoformat(),
+    }
+    history = [dict(snapshot)]
+    for i in range(1, count):
+        edit = rng.random()
+        if edit < 0.25:
+            paragraphs = snapshot["description"].split(". ")
+            paragraphs[rng.randrange(len(paragraphs))] = f"Updated note {i}"
+            snapshot["description"] = ". ".join(paragraphs)
+        elif edit < 0.5:
+            snapshot["title"] = f"Weekly planning #{i}"
+        elif edit < 0.7:
+            snapshot["location"] = f"Room {rng.randint(1, 9)}.{rng.randint(1, 40)}"
+        else:
+            moved = start + timedelta(minutes=30 * rng.randint(-4, 4))
+            snapshot["start_time"] = moved.isoformat()
+            snapshot["end_time"] = (moved + timedelta(hours=1)).isoformat()
+        history.append(dict(snapshot))
+    return history
+
+
+def size(data):
+    return len(json.dumps(data))
+
+
+def encode(history):
+    rows, previous = [], None
+    for number, snapshot in enumerate(history, start=1):
+        keyframe = previous is None or version_store.is_keyframe_version(number)
+        rows.append((keyframe, snapshot if keyframe else make_delta(previous, snapshot)))
+        previous = snapshot
+    return rows
+
+
+def rebuild(rows, number):
+    # The rows load_version reads: the nearest keyframe at or before the version, then its deltas
+    first = max(i for i in range(number) if rows[i][0])
+    snapshot = None
+    for keyframe, data in rows[first:number]:
+        snapshot = dict(data) if keyframe else apply_delta(snapshot, data)
+    return snapshot
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    if len(sys.argv) > 2:
+        version_store.KEYFRAME_INTERVAL = int(sys.argv[2])
+
+    history = make_history(count)
+    rows = encode(history)
+    full = sum(size(snapshot) for snapshot in history)
+    encoded = sum(size(data) for _, data in rows)
+    keyframes = sum(1 for keyframe, _ in rows if keyframe)
+
+    started = time.perf_counter()
+    for number in range(1, count + 1):
+        assert rebuild(rows, number) == history[number - 1]
+    elapsed = time.perf_counter() - started
+
+    print(f"{count} versions, keyframe every {version_store.KEYFRAME_INTERVAL} ({keyframes} keyframes)")
+    print(f"   full snapshots: {full / 1024:,.1f} KiB ({full / count:,.0f} bytes per version)")
+    print(f"  delta + keyframe: {encoded / 1024:,.1f} KiB ({encoded / count:,.0f} bytes per version)")
+    print(f"        reduction: {1 - encoded / full:.1%}")
+    print(f"   reconstruction: {elapsed / count * 1e6:,.1f} us per version, all versions verified")
+
+
+if __name__ == "__main__":
+    main()